@@ -0,0 +1,46 @@
+# Time to build each download format and the size of the file, for a month of weekly rows
+#   python benchmarks/bench_exports.py [--weeks N] [--rows N] [--repeat N]
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from benchmarks.workbooks import weekly_frame
+from rep_export import export_formats
+
+
+def best_of(func, sheets, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = func(sheets)
+        seconds.append(time.perf_counter() - start)
+    return data, min(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export time and file size per download format')
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=50000, help='rows per week')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    weeks = [weekly_frame(args.rows, dt.date(2024, 5, 5) + dt.timedelta(weeks=i), seed=i) for i in range(args.weeks)]
+    df = pd.concat(weeks, ignore_index=True)
+    bino = df['Category'] == 'Bino'
+    sheets = {'Bino': df[bino].reset_index(drop=True), 'Everything Else': df[~bino].reset_index(drop=True)}
+
+    print(f"{len(df)} rows over {args.weeks} weeks")
+    print(f"{'format':<10}{'seconds':>10}{'MB':>10}")
+    for export in export_formats():
+        data, seconds = best_of(export.write, sheets, args.repeat)
+        print(f"{export.extension:<10}{seconds:>10.3f}{len(data) / 2**20:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
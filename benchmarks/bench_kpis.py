@@ -0,0 +1,67 @@
+# Report KPIs for one month out of a year of loaded weeks: SQL before and after the composite
+# indexes, against pandas over the same month already in memory
+#   python benchmarks/bench_kpis.py [--weeks N] [--rows N] [--repeat N] [--url URL]
+import argparse
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from benchmarks.workbooks import weekly_frame
+from rep_kpis import SqlKpis, frame_kpis
+from rep_sqlload import bulk_load, ensure_report_indexes
+
+TABLE = 'bench_repsellout'
+
+
+def best_of(func, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return result, min(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time SqlKpis with and without its indexes')
+    parser.add_argument('--weeks', type=int, default=52)
+    parser.add_argument('--rows', type=int, default=20000, help='rows per week')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--url', help='SQLAlchemy URL (a temp SQLite file if left out)')
+    args = parser.parse_args()
+
+    first = dt.date(2024, 1, 7)
+    weeks = [weekly_frame(args.rows, first + dt.timedelta(weeks=i), seed=i) for i in range(args.weeks)]
+    df = pd.concat(weeks, ignore_index=True)
+    start, end = first + dt.timedelta(weeks=args.weeks // 2), first + dt.timedelta(weeks=args.weeks // 2 + 3)
+    month = df[(df['Week Ending'] >= pd.Timestamp(start)) & (df['Week Ending'] <= pd.Timestamp(end))]
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = create_engine(args.url or f"sqlite:///{os.path.join(folder, 'bench.sqlite')}")
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+        load = bulk_load(df, TABLE, engine)
+        print(f"{len(df)} rows in {args.weeks} weeks seeded in {load.seconds:.1f}s, {len(month)} rows in the month")
+        print(f"{'kpis':<16}{'seconds':>10}")
+
+        stats = SqlKpis(engine, TABLE)
+        expected, seconds = best_of(lambda: frame_kpis(month), args.repeat)
+        print(f"{'pandas':<16}{seconds:>10.4f}")
+        _, seconds = best_of(lambda: stats.kpis(start, end), args.repeat)
+        print(f"{'sql':<16}{seconds:>10.4f}")
+        ensure_report_indexes(engine, TABLE, '365 Code')
+        result, seconds = best_of(lambda: stats.kpis(start, end), args.repeat)
+        print(f"{'sql + indexes':<16}{seconds:>10.4f}")
+        pd.testing.assert_frame_equal(expected.top_retailers, result.top_retailers, check_dtype=False)
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
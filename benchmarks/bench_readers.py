@@ -0,0 +1,46 @@
+# Compares xlsx read engines on rep workbook, pricelist and weekly output shapes
+#   python benchmarks/bench_readers.py [--repeat N]
+import argparse
+import os
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.workbooks import pricelist_workbook, rep_workbook, weekly_workbook
+from rep_readers import ENGINES, engine_available, read_excel
+
+
+def best_of(repeat, read):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        read()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare xlsx read engines')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    shapes = {
+        'rep workbook (6 sheets)': (rep_workbook(), dict(sheet_name=None, header=None)),
+        'pricelist': (pricelist_workbook(), dict(sheet_name='Master Sheet', header=1)),
+        'weekly output': (weekly_workbook(), dict(sheet_name=None))
+    }
+    engines = [engine for engine in ENGINES if engine_available(engine)]
+
+    print(f"{'shape':<26}{'size KB':>9}" + ''.join(f'{engine:>12}' for engine in engines))
+    for shape, (data, kwargs) in shapes.items():
+        row = f'{shape:<26}{len(data) / 1024:>9.0f}'
+        for engine in engines:
+            seconds = best_of(args.repeat, lambda: read_excel(BytesIO(data), engine=engine, **kwargs))
+            row += f'{seconds:>11.3f}s'
+        print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Sell Out summed and the newest SOH and price per product, rep and retailer over several weeks:
+# sort by date then groupby 'last', against latest_snapshot with no sort
+#   python benchmarks/bench_snapshot.py [--weeks N] [--rows N]
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.workbooks import weekly_frame
+from rep_aggregate import latest_snapshot
+
+KEYS = ['365 Code', 'Product Description', 'Category', 'Sub-Cat', 'Rep', 'Retailer']
+
+
+def sort_then_last(df):
+    df = df.sort_values(by='Date', kind='stable')
+    return df.groupby(KEYS).agg({'Sell Out': 'sum', 'Stock on Hand': 'last', 'Dealer Price': 'last'})
+
+
+def snapshot(df):
+    return latest_snapshot(df, KEYS, ['Sell Out'], ['Stock on Hand', 'Dealer Price'], sort=True)
+
+
+def best_of(func, df, repeat=3):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        seconds.append(time.perf_counter() - start)
+    return result, min(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare sort + groupby last with latest_snapshot')
+    parser.add_argument('--weeks', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=200000, help='rows per week')
+    args = parser.parse_args()
+
+    weeks = [weekly_frame(args.rows, dt.date(2024, 5, 5) + dt.timedelta(weeks=i), seed=i) for i in range(args.weeks)]
+    df = pd.concat(weeks, ignore_index=True)
+    # Weeks arrive in any order, and blank SOH means "not counted this week"
+    df = df.iloc[np.random.default_rng(0).permutation(len(df))].reset_index(drop=True)
+    df['Date'] = df['Week Ending']
+    # A few rows without a date, which the sort puts last
+    df.loc[df.index % 101 == 0, 'Date'] = pd.NaT
+    df['Sub-Cat'] = df['Sub-Cat'].fillna(' ')
+    df.loc[df.index % 9 == 0, 'Stock on Hand'] = np.nan
+
+    expected, sort_seconds = best_of(sort_then_last, df)
+    result, snapshot_seconds = best_of(snapshot, df)
+    pd.testing.assert_frame_equal(expected, result)
+
+    print(f"{len(df)} rows, {len(result)} groups")
+    print(f"{'sort + last':<18}{sort_seconds:>10.3f}")
+    print(f"{'latest_snapshot':<18}{snapshot_seconds:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# Loading a month of rows into a fact table: pandas to_sql as the app used to, against bulk_load
+# per method. Runs on SQLite by default; pass --url for a MySQL stand-in (the table is created there)
+#   python benchmarks/bench_sqlload.py [--weeks N] [--rows N] [--batch-rows N] [--url URL]
+import argparse
+import datetime as dt
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from benchmarks.workbooks import weekly_frame
+from rep_sqlload import LOAD_METHODS, bulk_load
+
+TABLE = 'bench_repsellout'
+
+
+def fresh_table(engine, df):
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS {TABLE}'))
+    df.head(0).to_sql(TABLE, engine, index=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare to_sql with bulk_load per method')
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=50000, help='rows per week')
+    parser.add_argument('--batch-rows', type=int, default=5000)
+    parser.add_argument('--url', help='SQLAlchemy URL (a temp SQLite file if left out)')
+    args = parser.parse_args()
+
+    weeks = [weekly_frame(args.rows, dt.date(2024, 5, 5) + dt.timedelta(weeks=i), seed=i) for i in range(args.weeks)]
+    df = pd.concat(weeks, ignore_index=True)
+    df['Date Created'] = dt.datetime.now()
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine = create_engine(args.url or f"sqlite:///{os.path.join(folder, 'bench.sqlite')}")
+        print(f"{len(df)} rows into {engine.dialect.name}")
+        print(f"{'method':<14}{'seconds':>10}{'rows/sec':>12}")
+
+        fresh_table(engine, df)
+        start = time.perf_counter()
+        df.to_sql(TABLE, engine, if_exists='append', index=False)
+        seconds = time.perf_counter() - start
+        print(f"{'to_sql':<14}{seconds:>10.3f}{len(df) / seconds:>12,.0f}")
+
+        for method in LOAD_METHODS:
+            if method == 'infile' and engine.dialect.name != 'mysql':
+                continue
+            fresh_table(engine, df)
+            result = bulk_load(df, TABLE, engine, method=method, batch_rows=args.batch_rows)
+            print(f"{method:<14}{result.seconds:>10.3f}{result.rows_per_second:>12,.0f}")
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+# Rows materialised and peak memory when unpivoting all weeks and filtering,
+# against pushing the selected week down to the column plan
+#   python benchmarks/bench_week_pushdown.py [--reps N] [--products N]
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from benchmarks.workbooks import rep_sheet
+from rep_transform import transform_data
+
+
+def measure(sheets, weeks):
+    tracemalloc.start()
+    start = time.perf_counter()
+    transformed_dfs = [transform_data(sheet, '365 Code', weeks=weeks) for sheet in sheets]
+    rows = sum(len(df) for df in transformed_dfs)
+    final_df = pd.concat(transformed_dfs, ignore_index=True)
+    final_df = final_df[final_df['Week No.'] == 'Week 3']
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return final_df.reset_index(drop=True), rows, peak, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare week pushdown with filtering after the unpivot')
+    parser.add_argument('--reps', type=int, default=12)
+    parser.add_argument('--products', type=int, default=400)
+    args = parser.parse_args()
+
+    sheets = [rep_sheet(products=args.products, seed=i) for i in range(args.reps)]
+    everything, all_rows, all_peak, all_seconds = measure(sheets, None)
+    pushed, pushed_rows, pushed_peak, pushed_seconds = measure(sheets, ['Week 3'])
+    pd.testing.assert_frame_equal(everything, pushed)
+
+    print(f"{'':<22}{'rows':>10}{'peak MB':>10}{'seconds':>10}")
+    print(f"{'all weeks, filter':<22}{all_rows:>10}{all_peak / 2**20:>10.1f}{all_seconds:>10.3f}")
+    print(f"{'week pushdown':<22}{pushed_rows:>10}{pushed_peak / 2**20:>10.1f}{pushed_seconds:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
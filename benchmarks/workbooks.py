@@ -0,0 +1,108 @@
+# Synthetic workbooks shaped like the real rep reports, for the benchmarks
+import datetime as dt
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+RETAILERS = ['Makro', 'Game', 'Incredible Connection', 'Takealot', 'Hi-Fi Corp', 'Pick n Pay', 'Checkers', 'Dion Wired']
+PRODUCT_COLUMNS = ['365 Code', 'Product Description', 'Category', 'Sub-Cat']
+
+
+def rep_sheet(products=400, retailers=RETAILERS, weeks=10, seed=0):
+    """One rep sheet in the 365 Code layout, header rows included
+    in:  number of products, retailers, weeks
+    out: dataframe to write with header=False
+    """
+    rng = np.random.default_rng(seed)
+    first_week = dt.datetime(2024, 5, 5)
+    id_count = len(PRODUCT_COLUMNS)
+
+    header = [[None] * id_count for _ in range(4)]
+    header[1][-1] = 'Date SOH was Collected:'
+    header[3] = list(PRODUCT_COLUMNS)
+    for retailer in retailers:
+        for week in range(weeks):
+            date = first_week + dt.timedelta(days=7 * week)
+            header[0] += [retailer, retailer]
+            header[1] += [date, date]
+            header[2] += [f'Week {week}', None]
+            header[3] += ['SOH', 'Sell Out']
+        header[0] += [retailer]
+        header[1] += [None]
+        header[2] += [None]
+        header[3] += ['Notes']
+
+    measures = len(header[0]) - id_count
+    values = rng.integers(0, 30, size=(products, measures)).astype(object)
+    values[rng.random(values.shape) < 0.3] = None
+    products_df = pd.DataFrame({
+        '365 Code': [f'SN{i:05d}' for i in range(products)],
+        'Product Description': [f'Product {i}' for i in range(products)],
+        'Category': np.where(np.arange(products) % 5 == 0, 'Bino', 'Camera'),
+        'Sub-Cat': np.where(np.arange(products) % 2 == 0, 'Compact', None)
+    })
+    data = np.hstack([products_df.to_numpy(dtype=object), values])
+    return pd.DataFrame(header + data.tolist())
+
+
+def rep_workbook(reps=6, **kwargs):
+    """A rep workbook with one sheet per rep, as bytes"""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        for i in range(reps):
+            rep_sheet(seed=i, **kwargs).to_excel(writer, sheet_name=f'Rep {i}', header=False, index=False)
+    return output.getvalue()
+
+
+def pricelist_frame(products=2000, seed=0):
+    """Pricelist rows, codes matching rep_sheet"""
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(50, 5000, products).round(2).astype(object)
+    prices[rng.random(products) < 0.02] = 'TBA'
+    return pd.DataFrame({
+        'Item number': [f'sn{i:05d}' for i in range(products)],
+        'Description': [f'Product {i}' for i in range(products)],
+        'Dealer Excl': prices
+    })
+
+
+def pricelist_workbook(products=2000):
+    """Pricelist in the 'Master Sheet' layout (title row, then header), as bytes"""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        pricelist_frame(products).to_excel(writer, sheet_name='Master Sheet', index=False, startrow=1)
+    return output.getvalue()
+
+
+def weekly_frame(rows=20000, week_ending=dt.date(2024, 5, 5), seed=0):
+    """Rows shaped like the weekly report output"""
+    rng = np.random.default_rng(seed)
+    products = rng.integers(0, 2000, rows)
+    sell_out = rng.integers(0, 20, rows)
+    price = rng.uniform(50, 5000, rows).round(2)
+    return pd.DataFrame({
+        '365 Code': [f'SN{i:05d}' for i in products],
+        'Product Description': [f'Product {i}' for i in products],
+        'Category': np.where(products % 5 == 0, 'Bino', 'Camera'),
+        'Sub-Cat': np.where(products % 2 == 0, 'Compact', None),
+        'Rep': [f'Rep {i}' for i in rng.integers(0, 12, rows)],
+        'Week Ending': pd.Timestamp(week_ending),
+        'Retailer': rng.choice(RETAILERS, rows),
+        'Week No.': 'Week 1',
+        'Stock on Hand': rng.integers(0, 50, rows),
+        'Sell Out': sell_out,
+        'Dealer Price': price,
+        'Amount': sell_out * price,
+        'Date Created': pd.Timestamp('2024-05-06 09:00')
+    })
+
+
+def weekly_workbook(rows=20000, **kwargs):
+    """Weekly report output with its Bino and Everything Else sheets, as bytes"""
+    df = weekly_frame(rows, **kwargs)
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        df[df['Category'] == 'Bino'].to_excel(writer, sheet_name='Bino', index=False)
+        df[df['Category'] != 'Bino'].to_excel(writer, sheet_name='Everything Else', index=False)
+    return output.getvalue()
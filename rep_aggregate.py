@@ -0,0 +1,70 @@
+# Grouped aggregation that sums some columns and takes the newest value of others, without sorting
+import numpy as np
+import pandas as pd
+
+
+def _date_values(dates):
+    """Dates as int64 nanoseconds for comparing, blanks as the largest value: sorting by date puts
+    them last, so the sort-then-last this stands in for took a blank date as the newest
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dates.dtype):
+        dates = pd.to_datetime(dates)
+    # NaT is the smallest int64
+    values = dates.to_numpy(dtype='datetime64[ns]').view('int64')
+    return np.where(values == np.iinfo('int64').min, np.iinfo('int64').max, values)
+
+
+def _spread(picked, found):
+    """Values picked for the groups that had one, blank for the rest"""
+    if found.all():
+        return picked.to_numpy()
+    return pd.Series(picked.to_numpy(), index=np.flatnonzero(found)).reindex(range(len(found))).to_numpy()
+
+
+def latest_snapshot(df, keys, sums=(), snapshots=(), date='Date', with_dates=False, sort=False):
+    """groupby(keys).agg(sum, last) as if the frame were sorted by date first, in hash-grouped passes
+    in:  dataframe, key columns, columns to sum, columns to take the newest non-blank value of,
+         date column (or {snapshot column: date column}), whether to return each snapshot's date
+         under its date column name, whether to sort the result by key
+    out: dataframe indexed by keys; rows with a blank key are left out, as in groupby. Among
+         rows with the same date the one further down the frame wins, like a stable sort
+    """
+    dates = date if isinstance(date, dict) else {column: date for column in snapshots}
+    if with_dates and len(set(dates.values())) < len(dates):
+        raise ValueError('with_dates needs a separate date column per snapshot column')
+
+    # One hash pass over the keys gives a group number per row and the key of each group
+    grouped = df.groupby(keys, sort=sort, observed=True)
+    codes = grouped.ngroup().to_numpy()
+    keep = codes >= 0
+    codes = codes[keep].astype('int64')
+    positions = np.flatnonzero(keep)
+    result = pd.DataFrame(index=grouped.size().index)
+    ngroups = len(result)
+
+    # Everything else works on the group numbers with numpy, without regrouping
+    for column in sums:
+        values = df[column].to_numpy()[positions]
+        totals = np.bincount(codes, weights=np.nan_to_num(values.astype('float64')), minlength=ngroups)
+        result[column] = totals.astype(values.dtype) if np.issubdtype(values.dtype, np.integer) else totals
+
+    # Each date column is turned into numbers once, however many snapshots share it
+    date_values = {name: _date_values(df[name])[positions] for name in dict.fromkeys(dates[column] for column in snapshots)}
+    for column in snapshots:
+        values = df[column].iloc[positions]
+        when = date_values[dates[column]]
+        valid = values.notna().to_numpy()
+
+        # Newest date per group among rows with a value, then the last row on that date
+        newest = np.full(ngroups, np.iinfo('int64').min)
+        np.maximum.at(newest, codes[valid], when[valid])
+        pick = valid & (when == newest[codes])
+        chosen = np.full(ngroups, -1)
+        np.maximum.at(chosen, codes[pick], np.flatnonzero(pick))
+
+        found = chosen >= 0
+        result[column] = _spread(values.iloc[chosen[found]], found)
+        if with_dates:
+            result[dates[column]] = _spread(df[dates[column]].iloc[positions].iloc[chosen[found]], found)
+
+    return result
@@ -0,0 +1,96 @@
+# Parsed workbooks kept in memory, keyed by a hash of the file contents,
+# so Streamlit reruns and other sessions skip re-reading the same upload
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+from rep_readers import read_excel
+
+# Memory cap for cached frames, overridable with REP_CACHE_MB
+DEFAULT_CACHE_MB = int(os.environ.get('REP_CACHE_MB', 512))
+
+
+def content_hash(data):
+    """SHA-256 of a file's bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_key(data_hash, **kwargs):
+    """Cache key for a file read with the given read_excel arguments"""
+    return data_hash, 'read_excel', tuple(sorted(kwargs.items()))
+
+
+def frame_bytes(value):
+    """Memory held by a dataframe, or a list or dict of them"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        value = list(value.values())
+    return sum(frame_bytes(item) for item in value)
+
+
+class ParseCache:
+    """Least recently used cache of parsed frames with a memory cap"""
+
+    def __init__(self, max_mb=DEFAULT_CACHE_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = frame_bytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.used_bytes -= self._entries.pop(key)[1]
+            # Anything bigger than the whole cap is not kept at all
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.used_bytes -= evicted
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# One cache per process, shared by every Streamlit session
+PARSE_CACHE = ParseCache()
+
+
+def read_cached_excel(uploaded_file, cache=PARSE_CACHE, **kwargs):
+    """read_excel for an uploaded file, reusing the result for identical bytes
+    in:  uploaded file (anything with .getvalue()), read_excel keyword arguments
+    out: dataframe or dict of dataframes; a copy, so callers may change it
+    """
+    data = uploaded_file.getvalue()
+    key = read_key(content_hash(data), **kwargs)
+    value = cache.get(key)
+    if value is None:
+        value = cache.put(key, read_excel(BytesIO(data), **kwargs))
+    if isinstance(value, dict):
+        return {name: df.copy() for name, df in value.items()}
+    return value.copy()
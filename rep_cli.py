@@ -0,0 +1,189 @@
+# The weekly, monthly and SQL upload flows from the command line, without starting Streamlit,
+# so a scheduled job can work through a whole folder of workbooks in one go
+#   python rep_cli.py weekly --layout lexar --week-use 3 --week-call 4 --week-ending 2024-05-12 --pricelist pl.xlsx --out reports 'reps/*.xlsx'
+#   python rep_cli.py monthly --layout 365 --month-ending 2024-05-31 --out reports 'reports/*_Weekly_*.parquet'
+#   python rep_cli.py upload --layout 365 'reports/*_Weekly_*.parquet'
+import argparse
+import datetime as dt
+import glob
+import os
+import sys
+import time
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import ArgumentError
+
+from rep_engine import create_sql_engine, sql_url
+from rep_export import EXPORT_FORMATS, export_file_name
+from rep_jobs import UPLOAD_JOBS
+from rep_loaded import DEFAULT_TARGET, LOADED_KEYS
+from rep_reports import REPORT_SPECS, monthly_report, upload_frame, weekly_report
+
+# Short names for the report specs, as typed on the command line
+LAYOUT_NAMES = {'365': '365 Code', 'ax': 'AX code', 'lexar': 'Lexar', 'sony': 'Sony'}
+
+# Seconds between progress lines while an upload runs
+POLL_SECONDS = 1.0
+
+
+class LocalFile:
+    """A file on disk passed where the flows expect an upload (anything with .name and .getvalue())"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def getvalue(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+def expand(patterns):
+    """Files matched by the patterns, in order and each once
+    in:  glob patterns or plain paths
+    out: list of LocalFile
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or ([pattern] if os.path.isfile(pattern) else [])
+        if not matches:
+            raise SystemExit(f"No files match {pattern}")
+        paths.extend(path for path in matches if path not in paths)
+    return [LocalFile(path) for path in paths]
+
+
+def write_report(sheets, out, date_end, report_type, formats):
+    """Writes the report in each format to out
+    in:  {sheet name: dataframe}, folder, end date, report type, EXPORT_FORMATS keys (None for xlsx)
+    out: paths written
+    """
+    os.makedirs(out, exist_ok=True)
+    paths = []
+    for key in formats or ['xlsx']:
+        export = EXPORT_FORMATS[key]
+        if not export.available():
+            raise SystemExit(f"{key} export is not available here")
+        path = os.path.join(out, export_file_name(date_end, report_type, export.extension))
+        with open(path, 'wb') as f:
+            f.write(export.write(sheets))
+        paths.append(path)
+    return paths
+
+
+def print_quality(quality):
+    print(", ".join(f"{label}: {count}" for label, count in quality.counts().items()))
+
+
+def run_weekly(args):
+    spec = REPORT_SPECS[LAYOUT_NAMES[args.layout]]
+    report = weekly_report(spec, expand(args.files), LocalFile(args.pricelist), args.week_use, args.week_call, args.week_ending, args.fold)
+    print(f"{report.timings['File'].nunique()} files, {len(report.final):,} rows, {report.memory_after:,.1f} MB")
+    print_quality(report.quality)
+    for path in write_report(report.sheets, args.out, args.week_ending, spec.report_type, args.format):
+        print(f"Wrote {path}")
+    if report.month:
+        print(f"Added to the month-to-date for {report.month}")
+    return 0
+
+
+def run_monthly(args):
+    spec = REPORT_SPECS[LAYOUT_NAMES[args.layout]]
+    report = monthly_report(spec, expand(args.files), args.month_ending, args.rebuild, args.drop_week or [])
+    if not report.weeks:
+        print("No weeks in this month: the files need 'Bino' and 'Everything Else' sheets", file=sys.stderr)
+        return 1
+    print(f"Weeks in this month so far: {', '.join(report.weeks)}")
+    for path in write_report(report.sheets, args.out, args.month_ending, 'Monthly', args.format):
+        print(f"Wrote {path}")
+    return 0
+
+
+def run_upload(args):
+    spec = REPORT_SPECS[LAYOUT_NAMES[args.layout]]
+    upload = upload_frame(spec, expand(args.files))
+    if upload is None:
+        print("Nothing to load: the files need 'Bino' and 'Everything Else' sheets", file=sys.stderr)
+        return 1
+    final_df, quality = upload
+    if not quality.clean:
+        print_quality(quality)
+    if final_df.empty:
+        print("Nothing to load.")
+        return 0
+
+    # --url is asked for on this run, so it wins over REP_SQL_URL
+    try:
+        url = make_url(args.url) if args.url else sql_url()
+    except (ArgumentError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    engine = create_sql_engine(url)
+
+    # The first check against a database reads the keys already in the table
+    already_loaded = LOADED_KEYS.contains(final_df, spec.code, engine, args.target)
+    if already_loaded.any():
+        print(f"{already_loaded.sum():,} of {len(final_df):,} rows were loaded before and will be updated")
+
+    # The same resumable job as the page, so a rerun after a failure carries on where it stopped
+    job = UPLOAD_JOBS.submit(final_df, engine, spec.code, args.target, ignore=['Date Created'])
+    status = UPLOAD_JOBS.status(job)
+    while not status.finished:
+        print(f"Uploading to {status.target}: batch {status.done + 1} of {status.batches}")
+        time.sleep(POLL_SECONDS)
+        status = UPLOAD_JOBS.status(job)
+    engine.dispose()
+
+    if status.state == 'failed':
+        print(f"Upload stopped after batch {status.done} of {status.batches}: {status.error}", file=sys.stderr)
+        return 1
+    print(f"DataFrame written to table {status.target} ({status.rows:,} rows, {status.updated:,} of them updated, {status.rows_per_second:,.0f} rows/sec).")
+    if status.dropped:
+        print(f"{status.dropped:,} rows were left out: a later row had the same code, Rep, Retailer and Week Ending")
+    return 0
+
+
+def parser():
+    date = dt.date.fromisoformat
+    main = argparse.ArgumentParser(description='Rep sell out and stock on hand reports without the web page')
+    commands = main.add_subparsers(dest='command', required=True)
+
+    weekly = commands.add_parser('weekly', help='one week from rep workbooks, priced from a pricelist')
+    weekly.add_argument('--layout', choices=['365', 'ax', 'lexar', 'sony'], required=True)
+    weekly.add_argument('--week-use', type=int, required=True, help='week number to read from the sheets')
+    weekly.add_argument('--week-call', type=int, required=True, help='week number to call it in the report')
+    weekly.add_argument('--week-ending', type=date, required=True, help='YYYY-MM-DD')
+    weekly.add_argument('--pricelist', required=True)
+    weekly.add_argument('--fold', action='store_true', help='add the week to the month-to-date (365 and ax only)')
+    weekly.set_defaults(run=run_weekly)
+
+    monthly = commands.add_parser('monthly', help='weekly reports folded into the month to date')
+    monthly.add_argument('--layout', choices=['365', 'ax'], required=True)
+    monthly.add_argument('--month-ending', type=date, required=True, help='YYYY-MM-DD')
+    monthly.add_argument('--rebuild', action='store_true', help='start the month again from these files only')
+    monthly.add_argument('--drop-week', action='append', type=date, metavar='YYYY-MM-DD',
+                         help='take a week ending out of the month first, repeat for more than one')
+    monthly.set_defaults(run=run_monthly)
+
+    for command in (weekly, monthly):
+        command.add_argument('--out', required=True, help='folder the report is written to')
+        command.add_argument('--format', action='append', choices=list(EXPORT_FORMATS),
+                             help='export format, repeat for more than one (default xlsx)')
+
+    upload = commands.add_parser('upload', help='weekly reports upserted into the SQL table (REP_SQL_URL)')
+    upload.add_argument('--layout', choices=['365', 'ax'], required=True)
+    upload.add_argument('--target', default=DEFAULT_TARGET)
+    upload.add_argument('--url', help='SQLAlchemy URL, used instead of REP_SQL_URL')
+    upload.set_defaults(run=run_upload)
+
+    for command, nargs in ((weekly, '+'), (monthly, '*'), (upload, '+')):
+        command.add_argument('files', nargs=nargs, help='files or glob patterns (quote them to let this expand them)')
+    return main
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# Compact dtypes for the weekly pipeline, applied once after ingestion
+import pandas as pd
+
+# Labels repeated across many rows: retailers, reps, weeks, categories and products
+CATEGORY_COLUMNS = [
+    '365 code', '365 Code', 'AX code', 'Product Description', 'Category', 'Sub-Cat',
+    'Capacity', 'Status', 'Rep', 'Retailer', 'Week No.', 'Date SOH was Collected'
+]
+INTEGER_COLUMNS = ['Stock on Hand', 'Sell Out']
+
+# Prices stay float64: in float32 a price like 4999.99 is off by a fraction of a cent,
+# which then shows up in Amount
+
+
+def memory_mb(df):
+    """Memory held by a dataframe in MB, strings included"""
+    return df.memory_usage(index=True, deep=True).sum() / 2**20
+
+
+def apply_dtype_policy(df, categories=CATEGORY_COLUMNS, integers=INTEGER_COLUMNS):
+    """Categoricals for label columns and int32 for unit columns
+    in:  dataframe, columns to make categorical, columns to make int32
+    out: dataframe with those of the columns it has converted
+    """
+    df = df.copy(deep=False)
+    for column in df.columns.intersection(categories):
+        df[column] = df[column].astype('category')
+    for column in df.columns.intersection(integers):
+        df[column] = df[column].astype('int32')
+    return df
+
+
+def upper_labels(series):
+    """str.upper that keeps a categorical column categorical, upper-casing each category once"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if categories.map(lambda value: isinstance(value, str)).all():
+            upper = categories.str.upper()
+            if upper.is_unique:
+                return series.cat.rename_categories(upper)
+        return series.astype(object).str.upper().astype('category')
+    return series.str.upper()
+
@@ -0,0 +1,66 @@
+# Where the SQL upload goes and the pooled engine it goes through, configured outside the code
+import os
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import URL, make_url
+
+from rep_sqlload import DEFAULT_METHOD
+
+# A full SQLAlchemy URL in the environment wins over the [sql] section of the Streamlit secrets
+URL_ENV = 'REP_SQL_URL'
+DEFAULT_DRIVER = 'mysql+mysqlconnector'
+
+# Connections kept open per process, and how many more a busy moment may borrow
+POOL_SIZE = int(os.environ.get('REP_SQL_POOL_SIZE', 5))
+MAX_OVERFLOW = int(os.environ.get('REP_SQL_MAX_OVERFLOW', 5))
+POOL_TIMEOUT = 30
+
+# Seconds before a connection is replaced, well inside MySQL's and the firewall's idle timeouts
+POOL_RECYCLE = int(os.environ.get('REP_SQL_POOL_RECYCLE', 1800))
+
+# The connect argument each MySQL driver wants before it allows LOAD DATA LOCAL INFILE
+LOCAL_INFILE_ARGS = {'mysqlconnector': 'allow_local_infile', 'pymysql': 'local_infile', 'mysqldb': 'local_infile'}
+
+
+def sql_url(settings=None):
+    """The database to upload to
+    in:  mapping with 'url', or with host, port, username, password, database (and optionally drivername);
+         REP_SQL_URL in the environment takes precedence
+    out: sqlalchemy URL
+    """
+    url = os.environ.get(URL_ENV)
+    if url:
+        return make_url(url)
+
+    settings = dict(settings or {})
+    if settings.get('url'):
+        return make_url(settings['url'])
+    if settings.get('host'):
+        # URL.create escapes the password, which an f-string would not
+        return URL.create(
+            settings.get('drivername', DEFAULT_DRIVER),
+            username=settings.get('username'),
+            password=settings.get('password'),
+            host=settings['host'],
+            port=int(settings['port']) if settings.get('port') else None,
+            database=settings.get('database')
+        )
+    raise ValueError(
+        f"No SQL connection configured: set {URL_ENV}, or url (or host, port, username, password "
+        "and database) under [sql] in .streamlit/secrets.toml"
+    )
+
+
+def create_sql_engine(url):
+    """A pooled engine that checks connections before use; create one per process and keep it
+    in:  URL or URL string
+    out: sqlalchemy Engine
+    """
+    url = make_url(url)
+    options = {'pool_pre_ping': True, 'pool_recycle': POOL_RECYCLE}
+    # SQLite picks its own pool, which takes no sizes
+    if url.get_backend_name() != 'sqlite':
+        options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT)
+    if DEFAULT_METHOD == 'infile' and url.get_driver_name() in LOCAL_INFILE_ARGS:
+        options['connect_args'] = {LOCAL_INFILE_ARGS[url.get_driver_name()]: True}
+    return create_engine(url, **options)
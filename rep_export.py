@@ -0,0 +1,149 @@
+# Report downloads written row by row, so a big month never sits in memory as a whole workbook
+import datetime as dt
+from dataclasses import dataclass
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+from rep_sidecar import SHEET_COLUMN, sidecar_available, to_sidecar
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Same look as DataFrame.to_excel
+HEADER_FORMAT = {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+DATE_FORMAT = 'yyyy-mm-dd'
+DATETIME_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+
+EXCEL_EPOCH = pd.Timestamp('1899-12-30')
+
+# Rows turned into Python values at a time while writing xlsx
+EXPORT_CHUNK_ROWS = 5000
+
+
+def _excel_serials(values):
+    """Dates as Excel day numbers, the way xlsxwriter stores them"""
+    stamps = pd.to_datetime(pd.Series(values, dtype=object) if values.dtype == object else values)
+    return ((stamps - EXCEL_EPOCH) / pd.Timedelta(days=1)).to_numpy(dtype='float64')
+
+
+def _kind(column):
+    """How a whole column is written, worked out without copying its values
+    in:  series
+    out: 'number', 'date', 'datetime', 'string' or 'other'
+    """
+    if pd.api.types.is_bool_dtype(column.dtype):
+        return 'other'
+    if pd.api.types.is_numeric_dtype(column.dtype):
+        return 'number'
+    if pd.api.types.is_datetime64_any_dtype(column.dtype):
+        return 'datetime'
+    values = column.cat.categories if isinstance(column.dtype, pd.CategoricalDtype) else column
+    # 'date' is datetime.date and not datetime.datetime; all blank ('empty') or mixed is written as it comes
+    return {'string': 'string', 'date': 'date'}.get(pd.api.types.infer_dtype(values, skipna=True), 'other')
+
+
+def _cells(column, kind):
+    """Part of a column as values ready for xlsxwriter, blanks as None
+    in:  series, its kind from _kind
+    out: list of values
+    """
+    values = column.to_numpy(dtype=object) if isinstance(column.dtype, pd.CategoricalDtype) else column.to_numpy()
+    blank = pd.isna(values)
+    if kind in ('date', 'datetime'):
+        values = _excel_serials(values)
+    # A copy, as to_numpy can hand back a read-only view of the frame
+    values = np.array(values, dtype=object)
+    values[blank] = None
+    return values.tolist()
+
+
+def write_xlsx(sheets, output=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Writes sheets with xlsxwriter's constant_memory mode, chunk_rows rows converted at a time,
+    so memory stays the same however long a sheet is
+    in:  {sheet name: dataframe}, file-like to write to (a new BytesIO if None), rows per chunk
+    out: the workbook as bytes when output is None, otherwise output
+    """
+    target = output if output is not None else BytesIO()
+    workbook = xlsxwriter.Workbook(target, {'constant_memory': True})
+    header_format = workbook.add_format(HEADER_FORMAT)
+    formats = {'date': workbook.add_format({'num_format': DATE_FORMAT}),
+               'datetime': workbook.add_format({'num_format': DATETIME_FORMAT})}
+
+    for name, df in sheets.items():
+        worksheet = workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, [str(column) for column in df.columns], header_format)
+
+        # Columns are typed once over the whole sheet, so every chunk writes a column the same way
+        kinds = [_kind(df.iloc[:, i]) for i in range(df.shape[1])]
+        writers = []
+        for kind in kinds:
+            if kind == 'number':
+                writers.append((worksheet.write_number, None))
+            elif kind in formats:
+                writers.append((worksheet.write_number, formats[kind]))
+            elif kind == 'string':
+                writers.append((worksheet.write_string, None))
+            else:
+                writers.append((worksheet.write, None))
+
+        # constant_memory only keeps the current row, so rows must go out in order
+        for first in range(0, len(df), chunk_rows):
+            chunk = df.iloc[first:first + chunk_rows]
+            columns = [_cells(chunk.iloc[:, i], kind) for i, kind in enumerate(kinds)]
+            for row, values in enumerate(zip(*columns), start=first + 1):
+                for col, value in enumerate(values):
+                    if value is not None:
+                        write, cell_format = writers[col]
+                        write(row, col, value, cell_format)
+
+    workbook.close()
+    return target.getvalue() if output is None else output
+
+
+def write_csv_gz(sheets, compresslevel=6):
+    """Every sheet as one gzip CSV, with a Sheet column when there is more than one sheet
+    in:  {sheet name: dataframe} with the same columns, gzip level (6 trades little size for speed)
+    out: bytes
+    """
+    frames = list(sheets.values())
+    if len(frames) > 1:
+        frames = [df.assign(**{SHEET_COLUMN: name}) for name, df in sheets.items()]
+    output = BytesIO()
+    # mtime 0 so the same data always gives the same file
+    pd.concat(frames, ignore_index=True).to_csv(
+        output, index=False, compression={'method': 'gzip', 'compresslevel': compresslevel, 'mtime': 0}
+    )
+    return output.getvalue()
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    """One way to download a report"""
+    label: str
+    extension: str
+    mime: str
+    write: object
+    available: object = lambda: True
+
+
+EXPORT_FORMATS = {
+    'xlsx': ExportFormat('Excel', 'xlsx', XLSX_MIME, write_xlsx),
+    'csv.gz': ExportFormat('gzip CSV', 'csv.gz', 'application/gzip', write_csv_gz),
+    'parquet': ExportFormat('Parquet (faster for Monthly and SQL upload)', 'parquet', 'application/octet-stream',
+                            to_sidecar, sidecar_available),
+}
+
+
+def export_formats():
+    """The export formats that can be written here, Excel first"""
+    return [export for export in EXPORT_FORMATS.values() if export.available()]
+
+
+def export_file_name(date_end, report_type, extension, filename="transformed_data"):
+    """Download name, dated by the report's end date
+    in:  end date, report type ('Weekly', 'Monthly', ...), extension without the dot
+    out: e.g. '2024-05-05_Weekly_transformed_data.xlsx'
+    """
+    return f"{date_end.strftime('%Y-%m-%d')}_{report_type}_{filename}.{extension}"
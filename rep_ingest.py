@@ -0,0 +1,140 @@
+# Reads rep workbooks into one long dataframe, optionally across a process pool
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
+
+import pandas as pd
+
+from rep_cache import PARSE_CACHE, content_hash, read_key
+from rep_readers import excel_sheet_names, excel_workbook
+from rep_transform import LAYOUTS, transform_data
+
+# Number of worker processes, overridable with REP_WORKERS
+DEFAULT_WORKERS = int(os.environ.get('REP_WORKERS', os.cpu_count() or 1))
+
+
+def transform_sheet(sheet_name, df, layout, weeks=None):
+    """Transforms one rep sheet and names its rep
+    in:  sheet name, sheet read with header=None, Layout, weeks to keep (None for all)
+    out: transformed sheet
+    """
+    transformed_df = transform_data(df, layout, weeks=weeks)
+    transformed_df['Rep'] = sheet_name  # Add the sheet name as the 'Rep' column
+    return transformed_df
+
+
+def timing_row(name, sheet_name, seconds, source, worker=None):
+    """One row of the ingestion timings: a sheet of a file, the process that did it and how long it took"""
+    return {'File': name, 'Sheet': sheet_name, 'Worker': worker, 'Seconds': seconds, 'From': source}
+
+
+def read_rep_workbook(name, data, layout, weeks=None, all_sheets=None, sheet_names=None):
+    """Reads and transforms the sheets of one rep workbook, one sheet at a time
+    in:  file name, file bytes, Layout, weeks to keep (None for all),
+         sheets already read with header=None (None to read them from data), sheets to read (None for all)
+    out: {sheet name: transformed sheet}, {sheet name: sheet as read}, timing rows, one per sheet
+    """
+    transformed = {}
+    timings = []
+    if all_sheets is not None:
+        # Read before, so only the transform runs again
+        for sheet_name, df in all_sheets.items():
+            start = time.perf_counter()
+            transformed[sheet_name] = transform_sheet(sheet_name, df, layout, weeks)
+            timings.append(timing_row(name, sheet_name, time.perf_counter() - start, 'sheet cache', os.getpid()))
+        return transformed, all_sheets, timings
+
+    all_sheets = {}
+    with excel_workbook(BytesIO(data)) as workbook:
+        for sheet_name in sheet_names or workbook.sheet_names:
+            start = time.perf_counter()
+            all_sheets[sheet_name] = workbook.parse(sheet_name, header=None)
+            transformed[sheet_name] = transform_sheet(sheet_name, all_sheets[sheet_name], layout, weeks)
+            timings.append(timing_row(name, sheet_name, time.perf_counter() - start, 'file', os.getpid()))
+    return transformed, all_sheets, timings
+
+
+# File bytes handed to each worker process once, rather than with every sheet task
+_worker_datas = []
+
+
+def _share_datas(datas):
+    global _worker_datas
+    _worker_datas = datas
+
+
+def _read_in_worker(name, file, sheet_name, layout, weeks):
+    return read_rep_workbook(name, _worker_datas[file], layout, weeks, sheet_names=[sheet_name])
+
+
+def read_in_workers(names, datas, layout, weeks, workers):
+    """Reads and transforms rep workbooks across a process pool, one task per sheet, so the
+    sheets of a single workbook are spread over the workers too
+    in:  file names, file bytes, Layout, weeks to keep (None for all), worker count
+    out: list of results as read_rep_workbook gives them, one per file; the sheets as read come back
+         with the transformed ones so another week can be picked without reading the file again
+    """
+    tasks = [(i, sheet_name) for i, data in enumerate(datas) for sheet_name in excel_sheet_names(BytesIO(data))]
+    results = [({}, {}, []) for _ in datas]
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tasks))), initializer=_share_datas, initargs=(datas,)) as pool:
+        # map keeps file and sheet order, so the result matches the serial path exactly
+        done = pool.map(_read_in_worker, [names[i] for i, _ in tasks], [i for i, _ in tasks],
+                        [sheet_name for _, sheet_name in tasks], repeat(layout), repeat(weeks))
+        for (i, _), (transformed, all_sheets, timings) in zip(tasks, done):
+            results[i][0].update(transformed)
+            results[i][1].update(all_sheets)
+            results[i][2].extend(timings)
+    return results
+
+
+def ingest_workbooks(uploaded_files, layout, weeks=None, workers=DEFAULT_WORKERS, cache=PARSE_CACHE):
+    """Reads and transforms rep workbooks, in worker processes when workers is more than 1
+    in:  uploaded files (anything with .name and .getvalue()), Layout,
+         weeks to keep (None for all), worker count, ParseCache (None to always re-read)
+    out: concatenated dataframe in upload order, timings per file, sheet and worker
+    """
+    if isinstance(layout, str):
+        layout = LAYOUTS[layout]
+    names = [uploaded_file.name for uploaded_file in uploaded_files]
+    datas = [uploaded_file.getvalue() for uploaded_file in uploaded_files]
+    hashes = [content_hash(data) for data in datas]
+    keys = [(data_hash, layout.name, None if weeks is None else tuple(weeks)) for data_hash in hashes]
+    sheet_keys = [read_key(data_hash, sheet_name=None, header=None) for data_hash in hashes]
+
+    results = [None] * len(datas)
+    todo = []
+    for i, name in enumerate(names):
+        cached = cache.get(keys[i]) if cache is not None else None
+        all_sheets = cache.get(sheet_keys[i]) if cache is not None and cached is None else None
+        if cached is not None:
+            # Transformed before with this layout and week selection
+            results[i] = cached, None, [timing_row(name, sheet_name, 0.0, 'cache') for sheet_name in cached]
+        elif all_sheets is not None:
+            # Read before, so only the transform runs again (e.g. another week was picked), in this process
+            results[i] = read_rep_workbook(name, datas[i], layout, weeks, all_sheets)
+        else:
+            todo.append(i)
+
+    if workers > 1 and todo:
+        for i, result in zip(todo, read_in_workers([names[i] for i in todo], [datas[i] for i in todo], layout, weeks, workers)):
+            results[i] = result
+    else:
+        for i in todo:
+            results[i] = read_rep_workbook(names[i], datas[i], layout, weeks)
+
+    if cache is not None:
+        for i, (transformed, all_sheets, timings) in enumerate(results):
+            sources = {timing['From'] for timing in timings}
+            if sources != {'cache'}:
+                cache.put(keys[i], transformed)
+            if 'file' in sources:
+                cache.put(sheet_keys[i], all_sheets)
+
+    all_transformed_dfs = [df for transformed, _, _ in results for df in transformed.values()]
+    timings = pd.DataFrame([timing for _, _, rows in results for timing in rows],
+                           columns=['File', 'Sheet', 'Worker', 'Seconds', 'From'])
+
+    # Concatenate all transformed DataFrames
+    return pd.concat(all_transformed_dfs, ignore_index=True), timings
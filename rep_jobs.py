@@ -0,0 +1,218 @@
+# Uploads to SQL run on a background thread in numbered batches, tracked in the local store,
+# so the page stays responsive and a failed upload carries on from its last committed batch
+import hashlib
+import os
+import pickle
+import queue
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+
+import pandas as pd
+
+from rep_loaded import DEFAULT_TARGET, LOADED_KEYS
+from rep_sqlload import natural_key, upsert
+from rep_store import connect
+
+# Rows committed per batch; a failure loses at most this much work. Overridable with REP_SQL_JOB_ROWS
+DEFAULT_JOB_ROWS = int(os.environ.get('REP_SQL_JOB_ROWS', 20000))
+
+
+@dataclass(frozen=True)
+class JobStatus:
+    """Where one upload is; rows counts the rows written so far, dropped those left out as repeated keys"""
+    job: str
+    target: str
+    state: str
+    batches: int
+    done: int
+    rows: int
+    updated: int
+    seconds: float
+    dropped: int = 0
+    error: str = None
+
+    @property
+    def progress(self):
+        return self.done / self.batches if self.batches else 1.0
+
+    @property
+    def finished(self):
+        return self.state in ('done', 'failed')
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float('inf')
+
+
+def job_id(df, target, ignore=()):
+    """Same rows for the same table give the same id, so a rerun finds the job it already started
+    in:  dataframe, target table, columns that change on every run (like a created time)
+    out: 16-character hex id
+    """
+    data = df.drop(columns=[column for column in ignore if column in df.columns])
+    digest = hashlib.sha1('|'.join([target] + [str(column) for column in data.columns]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+class UploadJobs:
+    """A job table in the local store and one worker thread per process that works through it"""
+
+    def __init__(self, store_dir=None, loaded_keys=LOADED_KEYS):
+        self.store_dir = store_dir
+        self.loaded_keys = loaded_keys
+        self._queue = queue.Queue()
+        self._engines = {}
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        con = connect('upload_jobs', self.store_dir)
+        con.execute(
+            'CREATE TABLE IF NOT EXISTS upload_jobs ('
+            'job TEXT PRIMARY KEY, target TEXT, code TEXT, state TEXT, batches INTEGER, done INTEGER, '
+            'rows INTEGER, updated INTEGER, seconds REAL, error TEXT, created_at TEXT, updated_at TEXT, data BLOB, '
+            'written INTEGER DEFAULT 0, dropped INTEGER DEFAULT 0)'
+        )
+        # Stores made before rows written and dropped were kept; their finished jobs wrote every row
+        columns = [row[1] for row in con.execute('PRAGMA table_info(upload_jobs)')]
+        if 'written' not in columns:
+            with con:
+                con.execute('ALTER TABLE upload_jobs ADD COLUMN written INTEGER DEFAULT 0')
+                con.execute('ALTER TABLE upload_jobs ADD COLUMN dropped INTEGER DEFAULT 0')
+                con.execute("UPDATE upload_jobs SET written = rows WHERE state = 'done'")
+        con.execute(
+            'CREATE TABLE IF NOT EXISTS upload_batches ('
+            'job TEXT, batch INTEGER, first_row INTEGER, last_row INTEGER, updated INTEGER, done_at TEXT, '
+            'PRIMARY KEY (job, batch))'
+        )
+        return con
+
+    def submit(self, df, engine, code, target=DEFAULT_TARGET, batch_rows=None, ignore=()):
+        """Queues an upsert of df into target, unless the same rows are already loaded or on their way
+        in:  dataframe, SQLAlchemy engine, product code column, target table, rows per batch,
+             columns to leave out of the job id
+        out: job id
+        """
+        batch_rows = batch_rows or DEFAULT_JOB_ROWS
+        job = job_id(df, target, ignore)
+        # Rows repeating a key would overwrite each other, across batches too; keep the last of each
+        loaded = df.drop_duplicates(natural_key(code), keep='last')
+        dropped = len(df) - len(loaded)
+        df = loaded
+        with self._lock:
+            with closing(self._connect()) as con, con:
+                row = con.execute('SELECT state FROM upload_jobs WHERE job = ?', (job,)).fetchone()
+                if row is None:
+                    now = datetime.now().isoformat()
+                    batches = [(job, batch, first, min(first + batch_rows, len(df)))
+                               for batch, first in enumerate(range(0, len(df), batch_rows), start=1)]
+                    con.execute(
+                        'INSERT INTO upload_jobs VALUES (?, ?, ?, ?, ?, 0, ?, 0, 0, NULL, ?, ?, ?, 0, ?)',
+                        (job, target, code, 'queued', len(batches), len(df), now, now,
+                         pickle.dumps(df.reset_index(drop=True)), dropped)
+                    )
+                    con.executemany('INSERT INTO upload_batches VALUES (?, ?, ?, ?, 0, NULL)', batches)
+                elif row[0] == 'done' or job in self._engines:
+                    return job
+            # Still under the lock, so a quick rerun with the same rows can't queue the job twice
+            self._start(job, engine)
+        return job
+
+    def resume(self, job, engine):
+        """Queues a failed or interrupted job again; batches already committed are skipped"""
+        with self._lock:
+            if job not in self._engines:
+                self._start(job, engine)
+
+    def status(self, job):
+        """JobStatus for a job id, None if there is no such job"""
+        # Looked at before the row: the worker writes the final state before it lets go of the job
+        with self._lock:
+            queued = job in self._engines
+        with closing(self._connect()) as con:
+            row = con.execute(
+                'SELECT job, target, state, batches, done, written, updated, seconds, dropped, error '
+                'FROM upload_jobs WHERE job = ?',
+                (job,)
+            ).fetchone()
+        if row is None:
+            return None
+        status = JobStatus(*row)
+        # A job left running by a process that has gone can only be resumed
+        if status.state in ('queued', 'running') and not queued:
+            return JobStatus(*row[:2], 'failed', *row[3:9], status.error or 'The upload was interrupted')
+        return status
+
+    def _start(self, job, engine):
+        # Called with self._lock held
+        self._engines[job] = engine
+        with closing(self._connect()) as con, con:
+            con.execute(
+                "UPDATE upload_jobs SET state = 'queued', error = NULL, updated_at = ? WHERE job = ?",
+                (datetime.now().isoformat(), job)
+            )
+        self._queue.put(job)
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._work, name='rep-upload-jobs', daemon=True)
+            self._worker.start()
+
+    def _set(self, job, **values):
+        columns = ', '.join(f'{column} = ?' for column in values)
+        with closing(self._connect()) as con, con:
+            con.execute(
+                f'UPDATE upload_jobs SET {columns}, updated_at = ? WHERE job = ?',
+                (*values.values(), datetime.now().isoformat(), job)
+            )
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            except Exception as error:
+                self._set(job, state='failed', error=f'{type(error).__name__}: {error}')
+            finally:
+                with self._lock:
+                    self._engines.pop(job, None)
+                self._queue.task_done()
+
+    def _run(self, job):
+        engine = self._engines.get(job)
+        with closing(self._connect()) as con:
+            state, target, code, data = con.execute(
+                'SELECT state, target, code, data FROM upload_jobs WHERE job = ?', (job,)
+            ).fetchone()
+        # A job queued twice is worked through once; the second time finds it done (or has no engine)
+        if engine is None or state in ('running', 'done'):
+            return
+        with closing(self._connect()) as con:
+            pending = con.execute(
+                'SELECT batch, first_row, last_row FROM upload_batches WHERE job = ? AND done_at IS NULL ORDER BY batch',
+                (job,)
+            ).fetchall()
+        df = pickle.loads(data)
+        self._set(job, state='running')
+
+        for batch, first, last in pending:
+            rows = df.iloc[first:last]
+            # Each batch is its own transaction; the upsert makes redoing one that did commit harmless
+            result = upsert(rows, target, engine, natural_key(code))
+            self.loaded_keys.record(rows, code, engine, target)
+            with closing(self._connect()) as con, con:
+                con.execute(
+                    'UPDATE upload_batches SET updated = ?, done_at = ? WHERE job = ? AND batch = ?',
+                    (result.updated, datetime.now().isoformat(), job, batch)
+                )
+                con.execute(
+                    'UPDATE upload_jobs SET done = done + 1, written = written + ?, updated = updated + ?, '
+                    'dropped = dropped + ?, seconds = seconds + ?, updated_at = ? WHERE job = ?',
+                    (result.rows, result.updated, result.dropped, result.seconds, datetime.now().isoformat(), job)
+                )
+        self._set(job, state='done')
+
+
+# One worker per process; nothing is written until the first upload
+UPLOAD_JOBS = UploadJobs()
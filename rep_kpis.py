@@ -0,0 +1,178 @@
+# The headline numbers shown under a report, from the rows in hand or from fact_repsellout for any dates
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from rep_loaded import DEFAULT_TARGET
+
+TOP_ROWS = 10
+BINO = 'Bino'
+
+# Columns the KPIs are worked out from; nothing else changes them
+KPI_COLUMNS = ['Category', 'Product Description', 'Retailer', 'Sell Out', 'Amount']
+MEASURES = ['Sell Out', 'Amount']
+
+# Results kept for frames seen recently, so a rerun on the same rows does no grouping at all.
+# Only frames with categorical labels are cached, which is the weekly report after apply_dtype_policy;
+# the monthly and upload frames carry plain string labels and are worked out on every run
+CACHE_ENTRIES = 32
+
+
+@dataclass(frozen=True)
+class Kpis:
+    """Totals and top 10 tables, laid out the way df_stats shows them"""
+    total_amount: float
+    bino_amount: float
+    total_units: float
+    bino_units: float
+    top_products: pd.DataFrame
+    top_retailers: pd.DataFrame
+
+    @property
+    def other_amount(self):
+        return self.total_amount - self.bino_amount
+
+    @property
+    def other_units(self):
+        return self.total_units - self.bino_units
+
+
+def _codes(keys):
+    """Group number per row (-1 for blanks) and the value of each group, sorted like groupby"""
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        return keys.cat.codes.to_numpy(), keys.cat.categories
+    return pd.factorize(keys, sort=True)
+
+
+def _group_sums(df, by):
+    """Sell Out and Amount summed per value of by, in one bincount pass per measure
+    in:  dataframe, key column
+    out: dataframe indexed by the values that have rows, blanks left out as in groupby
+    """
+    codes, uniques = _codes(df[by])
+    seen = codes >= 0
+    codes = codes[seen]
+    sums = {}
+    for column in MEASURES:
+        values = df[column].to_numpy()[seen]
+        totals = np.bincount(codes, weights=np.nan_to_num(values.astype('float64')), minlength=len(uniques))
+        sums[column] = totals.astype('int64') if np.issubdtype(values.dtype, np.integer) else totals
+    observed = np.bincount(codes, minlength=len(uniques)) > 0
+    return pd.DataFrame(sums, index=pd.Index(uniques, name=by))[observed]
+
+
+def _top(df, by):
+    """The TOP_ROWS highest Amounts per value of by, picked without sorting every group"""
+    return _group_sums(df, by).nlargest(TOP_ROWS, 'Amount')
+
+
+def fingerprint(df, columns=KPI_COLUMNS):
+    """Digest of the values in columns, hashing categoricals and numbers as raw buffers
+    in:  dataframe, columns
+    out: hex digest, the same for the same values whatever the index; None when a column holds
+         plain strings, which take longer to hash than the KPIs take to work out
+    """
+    digest = hashlib.sha256()
+    digest.update(str(len(df)).encode())
+    for column in columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            digest.update(pd.util.hash_pandas_object(values.cat.categories, index=False).to_numpy().tobytes())
+            digest.update(np.ascontiguousarray(values.cat.codes.to_numpy()).tobytes())
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            digest.update(str(values.dtype).encode())
+            digest.update(np.ascontiguousarray(values.to_numpy()).tobytes())
+        else:
+            return None
+    return digest.hexdigest()
+
+
+def _compute_kpis(df):
+    """Kpis of report rows, worked out from scratch"""
+    # One pass over Category gives the totals and the Bino share; blanks land in bin 0
+    codes, uniques = _codes(df['Category'])
+    totals = {}
+    for column in ['Amount', 'Sell Out']:
+        values = np.nan_to_num(df[column].to_numpy().astype('float64'))
+        totals[column] = np.bincount(codes + 1, weights=values, minlength=len(uniques) + 1)
+    bino = uniques.get_loc(BINO) + 1 if BINO in uniques else None
+    return Kpis(
+        total_amount=totals['Amount'].sum(),
+        bino_amount=totals['Amount'][bino] if bino else 0.0,
+        total_units=totals['Sell Out'].sum(),
+        bino_units=totals['Sell Out'][bino] if bino else 0.0,
+        top_products=_top(df, 'Product Description'),
+        top_retailers=_top(df, 'Retailer')
+    )
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def frame_kpis(df):
+    """Kpis of report rows, from the cache when the same rows were seen lately
+    in:  dataframe with 'Category', 'Product Description', 'Retailer', 'Sell Out' and 'Amount';
+         only cached when the labels are categorical (see CACHE_ENTRIES)
+    out: Kpis (shared between callers; leave its tables as they are)
+    """
+    key = fingerprint(df)
+    if key is None:
+        return _compute_kpis(df)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+    kpis = _compute_kpis(df)
+    with _cache_lock:
+        _cache[key] = kpis
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return kpis
+
+
+class SqlKpis:
+    """The same Kpis as aggregate queries over the fact table, for any range of week endings"""
+
+    def __init__(self, engine, table=DEFAULT_TARGET, code='365 Code'):
+        self.engine = engine
+        self.table = table
+        self.code = code
+
+    def _top_sql(self, by, where):
+        quote = self.engine.dialect.identifier_preparer.quote
+        return (
+            f"SELECT {quote(by)}, SUM({quote('Sell Out')}) AS {quote('Sell Out')}, SUM({quote('Amount')}) AS {quote('Amount')} "
+            f"FROM {quote(self.table)} WHERE {where} GROUP BY {quote(by)} ORDER BY {quote('Amount')} DESC LIMIT {TOP_ROWS}"
+        )
+
+    def kpis(self, start, end):
+        """Kpis for the week endings from start to end, both included; reads only, the indexes it
+        uses are made by the upload (rep_sqlload.ensure_report_indexes)
+        in:  first and last date
+        out: Kpis, or None when the table has not been made yet
+        """
+        quote = self.engine.dialect.identifier_preparer.quote
+        week, units, amount = quote('Week Ending'), quote('Sell Out'), quote('Amount')
+        # Half-open range on whole days, so a week ending stored with a time of day still counts
+        where = f"{week} >= :start AND {week} < :end"
+        params = {'start': pd.Timestamp(start).to_pydatetime(),
+                  'end': (pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).to_pydatetime()}
+        is_bino = f"{quote('Category')} = :bino"
+
+        with self.engine.connect() as conn:
+            if not inspect(conn).has_table(self.table):
+                return None
+            totals = conn.execute(text(
+                f"SELECT COALESCE(SUM({amount}), 0), COALESCE(SUM(CASE WHEN {is_bino} THEN {amount} ELSE 0 END), 0), "
+                f"COALESCE(SUM({units}), 0), COALESCE(SUM(CASE WHEN {is_bino} THEN {units} ELSE 0 END), 0) "
+                f"FROM {quote(self.table)} WHERE {where}"
+            ), {**params, 'bino': BINO}).one()
+            tops = [pd.read_sql(text(self._top_sql(by, where)), conn, params=params, index_col=by)
+                    for by in ('Product Description', 'Retailer')]
+        return Kpis(*totals, *tops)
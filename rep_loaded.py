@@ -0,0 +1,167 @@
+# Hashes of the natural key of every row loaded to SQL, to stop the same week going in twice
+import threading
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import make_url
+
+from rep_store import connect
+
+# With the product code first, one row per product, rep, retailer and week
+NATURAL_KEY = ['Rep', 'Retailer', 'Week Ending']
+
+# Rows loaded go to this table unless told otherwise
+DEFAULT_TARGET = 'fact_repsellout'
+
+# Rows of the table read at a time when seeding the index from it
+SEED_CHUNK_ROWS = 100000
+
+
+def _key_labels(values, clean):
+    """Cleans each distinct value once; blanks become the text 'nan' so they still hash alike"""
+    codes, uniques = pd.factorize(values)
+    labels = np.append(clean(pd.Index(uniques)).to_numpy(dtype=object), 'nan')
+    return labels[codes]
+
+
+def key_hashes(df, code):
+    """64-bit hash of (code, Rep, Retailer, Week Ending) for each row
+    in:  dataframe, product code column
+    out: int64 numpy array; the same key hashes the same whatever the dtypes
+    """
+    keys = pd.DataFrame({
+        'code': _key_labels(df[code], lambda values: values.astype(str).str.upper()),
+        'Rep': _key_labels(df['Rep'], lambda values: values.astype(str)),
+        'Retailer': _key_labels(df['Retailer'], lambda values: values.astype(str)),
+        # A date from the weekly flow and a datetime read back from Excel are the same week
+        'Week Ending': _key_labels(df['Week Ending'], lambda values: pd.to_datetime(values).strftime('%Y-%m-%d'))
+    })
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy().view('int64')
+
+
+def sorted_unique(values):
+    """np.unique for int64 by sorting, which stays fast for millions of keys"""
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def database_key(bind):
+    """Which database an engine or URL points at, as stored with its keys: the URL with its password masked
+    in:  SQLAlchemy engine, URL or URL string
+    out: text
+    """
+    return make_url(getattr(bind, 'url', bind)).render_as_string(hide_password=True)
+
+
+class LoadedKeyIndex:
+    """Key hashes stored per load, one blob per batch, per database and table, read back into one sorted array"""
+
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir
+        # (database, target): (sorted unique keys, last batch read)
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        con = connect('loaded_keys', self.store_dir)
+        con.execute(
+            'CREATE TABLE IF NOT EXISTS loaded_batches ('
+            'batch INTEGER PRIMARY KEY AUTOINCREMENT, target TEXT, loaded_at TEXT, rows INTEGER, keys BLOB, database TEXT)'
+        )
+        # Stores made before the database was kept; their batches match no database, seed() reads the table instead
+        columns = [row[1] for row in con.execute('PRAGMA table_info(loaded_batches)')]
+        if 'database' not in columns:
+            with con:
+                con.execute('ALTER TABLE loaded_batches ADD COLUMN database TEXT')
+        con.execute(
+            'CREATE TABLE IF NOT EXISTS seeded_targets ('
+            'database TEXT, target TEXT, rows INTEGER, seeded_at TEXT, PRIMARY KEY (database, target))'
+        )
+        return con
+
+    def keys(self, bind, target=DEFAULT_TARGET):
+        """Sorted unique hashes of everything loaded to one table, reading only batches added since the last call
+        in:  engine or URL of the database, table
+        out: int64 numpy array
+        """
+        index = database_key(bind), target
+        with self._lock, closing(self._connect()) as con:
+            keys, last_batch = self._indexes.get(index, (np.empty(0, dtype='int64'), 0))
+            new = con.execute(
+                'SELECT batch, keys FROM loaded_batches WHERE database = ? AND target = ? AND batch > ? ORDER BY batch',
+                (*index, last_batch)
+            ).fetchall()
+            if new:
+                arrays = [keys] + [np.frombuffer(blob, dtype='int64') for _, blob in new]
+                keys = sorted_unique(np.concatenate(arrays))
+                self._indexes[index] = keys, new[-1][0]
+            return keys
+
+    def seeded(self, bind, target=DEFAULT_TARGET):
+        """Whether the rows already in the table were read into the index"""
+        with closing(self._connect()) as con:
+            return con.execute(
+                'SELECT 1 FROM seeded_targets WHERE database = ? AND target = ?', (database_key(bind), target)
+            ).fetchone() is not None
+
+    def seed(self, engine, code, target=DEFAULT_TARGET, chunk_rows=SEED_CHUNK_ROWS, refresh=False):
+        """Adds the keys of the rows already in the table, loaded before the index was kept or by another
+        instance; done once per database and table unless refresh is set
+        in:  SQLAlchemy engine, product code column, table, rows read at a time, read the table again
+        out: rows read (0 when it was seeded before)
+        """
+        if not refresh and self.seeded(engine, target):
+            return 0
+        hashes = [np.empty(0, dtype='int64')]
+        rows = 0
+        with engine.connect() as conn:
+            # A table not made yet has nothing to seed; the loads that make it are recorded as they go
+            if inspect(conn).has_table(target):
+                quote = conn.dialect.identifier_preparer.quote
+                columns = ', '.join(quote(column) for column in [code] + NATURAL_KEY)
+                for chunk in pd.read_sql(text(f'SELECT {columns} FROM {quote(target)}'), conn, chunksize=chunk_rows):
+                    hashes.append(sorted_unique(key_hashes(chunk, code)))
+                    rows += len(chunk)
+        with closing(self._connect()) as con, con:
+            self._insert(con, sorted_unique(np.concatenate(hashes)), rows, engine, target)
+            con.execute(
+                'INSERT OR REPLACE INTO seeded_targets VALUES (?, ?, ?, ?)',
+                (database_key(engine), target, rows, datetime.now().isoformat())
+            )
+        return rows
+
+    def contains(self, df, code, engine, target=DEFAULT_TARGET):
+        """Which rows are in the table already, seeding the index from the table the first time
+        in:  dataframe, product code column, SQLAlchemy engine, table
+        out: boolean numpy array, one per row
+        """
+        self.seed(engine, code, target)
+        # keys() is sorted and unique, so a binary search per row is enough
+        keys = self.keys(engine, target)
+        hashes = key_hashes(df, code)
+        if not len(keys):
+            return np.zeros(len(hashes), dtype=bool)
+        positions = np.searchsorted(keys, hashes).clip(max=len(keys) - 1)
+        return keys[positions] == hashes
+
+    def _insert(self, con, hashes, rows, bind, target):
+        return con.execute(
+            'INSERT INTO loaded_batches (target, loaded_at, rows, keys, database) VALUES (?, ?, ?, ?, ?)',
+            (target, datetime.now().isoformat(), rows, hashes.tobytes(), database_key(bind))
+        ).lastrowid
+
+    def record(self, df, code, bind, target=DEFAULT_TARGET):
+        """Adds the keys of rows just loaded
+        in:  dataframe, product code column, engine or URL of the database, table
+        out: batch number
+        """
+        hashes = sorted_unique(key_hashes(df, code))
+        with closing(self._connect()) as con, con:
+            return self._insert(con, hashes, len(df), bind, target)
+
+
+# One index per process; nothing is written until the first load
+LOADED_KEYS = LoadedKeyIndex()
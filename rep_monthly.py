@@ -0,0 +1,168 @@
+# Month-to-date totals kept between runs, so closing a month does not re-read every week
+import hashlib
+import pickle
+from contextlib import closing
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from rep_aggregate import latest_snapshot
+from rep_store import connect
+
+# Blank keys the monthly report has always filled in before grouping
+KEY_FILL = {'Sub-Cat': ' '}
+
+MEASURES = ['Sell Out', 'Stock on Hand', 'Dealer Price']
+
+# The week each kept SOH and price came from
+SNAPSHOT_DATES = {'Stock on Hand': 'SOH Date', 'Dealer Price': 'Price Date'}
+
+
+def _aggregate(rows, keys, week):
+    """One week's rows to one row per key: Sell Out summed, the last SOH and price kept
+    in:  rows of one week, key columns, week ending (Timestamp)
+    out: dataframe indexed by keys, with the week as the date of its SOH and price
+    """
+    # Plain object keys, so a week from the weekly flow and one read back from Excel line up
+    rows = rows.astype({column: object for column in keys if isinstance(rows[column].dtype, pd.CategoricalDtype)})
+    rows = rows.fillna({column: value for column, value in KEY_FILL.items() if column in keys})
+    rows = rows.assign(**{date: week for date in SNAPSHOT_DATES.values()})
+    return latest_snapshot(rows, keys, ['Sell Out'], list(SNAPSHOT_DATES), date=SNAPSHOT_DATES, with_dates=True)
+
+
+def _combine(state, week_totals):
+    """Folds one week into the running totals without sorting
+    in:  month-to-date state (None for an empty month), output of _aggregate
+    out: new state; the SOH and price of the latest week win, a later fold wins a tie
+    """
+    if state is None:
+        return week_totals
+    keys = list(week_totals.index.names)
+    both = pd.concat([state.reset_index(), week_totals.reset_index()], ignore_index=True)
+    return latest_snapshot(both, keys, ['Sell Out'], list(SNAPSHOT_DATES), date=SNAPSHOT_DATES, with_dates=True)
+
+
+class MonthToDate:
+    """Running monthly totals for one report layout, one state per sheet"""
+
+    def __init__(self, keys, date, store_dir=None):
+        self.keys = list(keys)
+        self.month = pd.Timestamp(date).strftime('%Y-%m')
+        self.store_dir = store_dir
+
+    def _connect(self):
+        con = connect('month_to_date', self.store_dir)
+        con.execute(
+            'CREATE TABLE IF NOT EXISTS mtd_state ('
+            'state TEXT PRIMARY KEY, month TEXT, sheet TEXT, keys TEXT, updated_at TEXT, data BLOB)'
+        )
+        con.execute(
+            'CREATE TABLE IF NOT EXISTS mtd_weeks ('
+            'state TEXT, week TEXT, folded_at TEXT, rows INTEGER, data BLOB, PRIMARY KEY (state, week))'
+        )
+        return con
+
+    def state_id(self, sheet):
+        return hashlib.sha1('|'.join([self.month, sheet] + self.keys).encode()).hexdigest()[:16]
+
+    def weeks(self, sheet):
+        """Week endings folded into this month so far, oldest first"""
+        with closing(self._connect()) as con:
+            rows = con.execute('SELECT week FROM mtd_weeks WHERE state = ? ORDER BY week', (self.state_id(sheet),))
+            return [week for week, in rows]
+
+    def fold(self, sheet, df):
+        """Adds the weeks in df to the month; a week supplied again replaces what it added before
+        in:  sheet name, weekly report rows with 'Week Ending', the key columns and MEASURES
+        out: week endings folded
+        """
+        state_id = self.state_id(sheet)
+        folded = []
+        with closing(self._connect()) as con, con:
+            row = con.execute('SELECT data FROM mtd_state WHERE state = ?', (state_id,)).fetchone()
+            state = pickle.loads(row[0]) if row else None
+            known = {week for week, in con.execute('SELECT week FROM mtd_weeks WHERE state = ?', (state_id,))}
+
+            week_endings = pd.to_datetime(df['Week Ending'])
+            replaced = False
+            for week, rows in df.groupby(week_endings.to_numpy(), sort=True):
+                week = pd.Timestamp(week)
+                week_totals = _aggregate(rows, self.keys, week)
+                label = week.strftime('%Y-%m-%d')
+                con.execute(
+                    'INSERT OR REPLACE INTO mtd_weeks VALUES (?, ?, ?, ?, ?)',
+                    (state_id, label, datetime.now().isoformat(), len(rows), pickle.dumps(week_totals))
+                )
+                replaced = replaced or label in known
+                if not replaced:
+                    state = _combine(state, week_totals)
+                folded.append(label)
+
+            if replaced:
+                # Only a corrected week needs the month rebuilt from each week's totals
+                state = None
+                for (data,) in con.execute('SELECT data FROM mtd_weeks WHERE state = ? ORDER BY week', (state_id,)):
+                    state = _combine(state, pickle.loads(data))
+
+            if folded:
+                con.execute(
+                    'INSERT OR REPLACE INTO mtd_state VALUES (?, ?, ?, ?, ?, ?)',
+                    (state_id, self.month, sheet, '|'.join(self.keys), datetime.now().isoformat(), pickle.dumps(state))
+                )
+        return folded
+
+    def close(self, sheet):
+        """The month so far, laid out like groupby(keys).agg(sum, last, last).reset_index()
+        in:  sheet name
+        out: dataframe with the key columns and MEASURES (empty if nothing was folded)
+        """
+        with closing(self._connect()) as con:
+            row = con.execute('SELECT data FROM mtd_state WHERE state = ?', (self.state_id(sheet),)).fetchone()
+        if row is None:
+            return pd.DataFrame(columns=self.keys + MEASURES)
+
+        month = pickle.loads(row[0]).sort_index()[MEASURES].reset_index()
+        # Unit columns went through float when weeks were joined; whole numbers go back to integers
+        for column in ['Sell Out', 'Stock on Hand']:
+            values = month[column]
+            if values.notna().all() and np.array_equal(values, values.round()):
+                month[column] = values.astype('int64')
+        return month
+
+    def drop(self, week):
+        """Takes one week back out of this month for this layout, all sheets, rebuilding from the other weeks
+        in:  week ending
+        out: whether the week was in the month
+        """
+        label = pd.Timestamp(week).strftime('%Y-%m-%d')
+        dropped = False
+        with closing(self._connect()) as con, con:
+            states = [state for state, in con.execute(
+                'SELECT state FROM mtd_state WHERE month = ? AND keys = ?', (self.month, '|'.join(self.keys))
+            )]
+            for state_id in states:
+                if con.execute('DELETE FROM mtd_weeks WHERE state = ? AND week = ?', (state_id, label)).rowcount == 0:
+                    continue
+                dropped = True
+                state = None
+                for (data,) in con.execute('SELECT data FROM mtd_weeks WHERE state = ? ORDER BY week', (state_id,)):
+                    state = _combine(state, pickle.loads(data))
+                if state is None:
+                    con.execute('DELETE FROM mtd_state WHERE state = ?', (state_id,))
+                else:
+                    con.execute(
+                        'UPDATE mtd_state SET data = ?, updated_at = ? WHERE state = ?',
+                        (pickle.dumps(state), datetime.now().isoformat(), state_id)
+                    )
+        return dropped
+
+    def reset(self):
+        """Forgets every week folded into this month for this layout, all sheets"""
+        with closing(self._connect()) as con, con:
+            states = [state for state, in con.execute(
+                'SELECT state FROM mtd_state WHERE month = ? AND keys = ?', (self.month, '|'.join(self.keys))
+            )]
+            for state_id in states:
+                con.execute('DELETE FROM mtd_weeks WHERE state = ?', (state_id,))
+                con.execute('DELETE FROM mtd_state WHERE state = ?', (state_id,))
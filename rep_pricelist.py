@@ -0,0 +1,130 @@
+# Pricelists imported once into the local store, keyed by the upper-cased item code
+from contextlib import closing
+from datetime import datetime
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from rep_cache import content_hash
+from rep_readers import read_excel
+from rep_store import connect, quote
+
+# How each pricelist workbook is laid out. price=None means the first column with 'Dealer' in its name
+PRICELIST_FORMATS = {
+    # Lexar and Sony pricelists: first sheet, 'No.' and 'Dealer Excl'
+    'Dealer Excl': {'read': {}, 'code': 'No.', 'price': 'Dealer Excl'},
+    # Master pricelist: title row above the header on 'Master Sheet'
+    'Master Sheet': {'read': {'sheet_name': 'Master Sheet', 'header': 1}, 'code': 'Item number', 'price': None}
+}
+
+# Lookups go to SQLite in batches of this many codes
+LOOKUP_BATCH = 500
+
+
+def prepare_pricelist(pricelist, code, price):
+    """Upper-cases codes and coerces prices once, at import
+    in:  pricelist as read, code column, price column
+    out: one row per code with 'Dealer Price' (numeric) and 'Price Text'
+         (the price cell when it was text, e.g. 'TBA')
+    """
+    items = pricelist.drop(columns=[code, price])
+    codes = pricelist[code]
+    items.insert(0, 'code', codes.where(codes.isna(), codes.astype(str).str.upper()))
+    items['Dealer Price'] = pd.to_numeric(pricelist[price], errors='coerce')
+    items['Price Text'] = pricelist[price].where(pricelist[price].map(lambda value: isinstance(value, str)))
+
+    # A code listed twice keeps its first row, so lookups never duplicate sales rows
+    items = items[items['code'].notna()].drop_duplicates('code')
+    return items.reset_index(drop=True)
+
+
+class PricelistStore:
+    """Pricelist versions in one SQLite file, one table per version"""
+
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir
+
+    def _connect(self):
+        con = connect('pricelists', self.store_dir)
+        con.execute(
+            'CREATE TABLE IF NOT EXISTS pricelist_versions ('
+            'version TEXT PRIMARY KEY, format TEXT, name TEXT, imported_at TEXT, items INTEGER)'
+        )
+        return con
+
+    @staticmethod
+    def table(version):
+        return f'pricelist_{version[:16]}'
+
+    def has_version(self, version):
+        with closing(self._connect()) as con:
+            return con.execute('SELECT 1 FROM pricelist_versions WHERE version = ?', (version,)).fetchone() is not None
+
+    def import_pricelist(self, uploaded_file, kind):
+        """Stores a pricelist workbook unless these exact bytes were imported before
+        in:  uploaded file (anything with .getvalue()), key of PRICELIST_FORMATS
+        out: version (SHA-256 of the file and its format)
+        """
+        data = uploaded_file.getvalue()
+        version = content_hash(data + kind.encode())
+        if self.has_version(version):
+            return version
+
+        layout = PRICELIST_FORMATS[kind]
+        pricelist = read_excel(BytesIO(data), **layout['read'])
+        price = layout['price'] or [col for col in pricelist.columns if 'Dealer' in str(col)][0]
+        items = prepare_pricelist(pricelist, layout['code'], price)
+
+        table = self.table(version)
+        with closing(self._connect()) as con, con:
+            items.to_sql(table, con, if_exists='replace', index=False)
+            con.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {quote(table + "_code")} ON {quote(table)} (code)')
+            con.execute(
+                'INSERT OR REPLACE INTO pricelist_versions VALUES (?, ?, ?, ?, ?)',
+                (version, kind, getattr(uploaded_file, 'name', None), datetime.now().isoformat(), len(items))
+            )
+        return version
+
+    def lookup(self, version, codes, columns):
+        """Fetches only the given columns for only the given codes
+        in:  version, item codes (already upper-cased), column names
+        out: dataframe indexed by code; codes not on the pricelist are left out
+        """
+        codes = pd.unique(pd.Series(codes, dtype=object).dropna())
+        select = ', '.join(quote(col) for col in ['code'] + list(columns))
+        frames = []
+        with closing(self._connect()) as con:
+            for start in range(0, len(codes), LOOKUP_BATCH):
+                batch = [str(code) for code in codes[start:start + LOOKUP_BATCH]]
+                frames.append(pd.read_sql(
+                    f'SELECT {select} FROM {quote(self.table(version))} WHERE code IN ({", ".join("?" * len(batch))})',
+                    con, params=batch
+                ))
+        if not frames:
+            return pd.DataFrame(columns=list(columns), index=pd.Index([], name='code'))
+        return pd.concat(frames, ignore_index=True).set_index('code')
+
+    def attach(self, df, code, version, columns):
+        """Adds pricelist columns to a dataframe by its product code, like a left merge
+        in:  dataframe, product code column, version, pricelist columns wanted
+        out: dataframe with those columns added (NaN where the code is not listed)
+        """
+        keys = df[code]
+        is_categorical = isinstance(keys.dtype, pd.CategoricalDtype)
+
+        # Look each distinct code up once, then spread the values back by row
+        uniques = keys.cat.categories if is_categorical else pd.Index(keys.dropna().unique())
+        positions = keys.cat.codes.to_numpy() if is_categorical else uniques.get_indexer(keys)
+        found = self.lookup(version, uniques, columns).reindex(uniques.astype(str))
+
+        df = df.copy(deep=False)
+        for col in columns:
+            values = found[col].to_numpy()
+            # Position -1 (blank code) picks the NaN appended at the end
+            df[col] = pd.Series(np.append(values, np.nan)[positions], index=df.index).infer_objects()
+        return df
+
+
+# One store per process; nothing is written until the first import
+PRICELIST_STORE = PricelistStore()
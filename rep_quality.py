@@ -0,0 +1,77 @@
+# Data-quality checks on the merged weekly frame, computed together in one pass
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Price status per row
+PRICED = 0
+NOT_ON_PRICELIST = 1
+WITHOUT_PRICE = 2
+
+UNIT_COLUMNS = ['Stock on Hand', 'Sell Out']
+DUPLICATE_KEYS = ['Rep', 'Retailer', 'Week No.']
+
+
+@dataclass(frozen=True)
+class QualityReport:
+    """What check_quality found, ready for st.table or a loader"""
+    code: str
+    not_on_pricelist: pd.DataFrame
+    without_price: pd.DataFrame
+    duplicates: pd.DataFrame
+
+    @property
+    def clean(self):
+        return self.not_on_pricelist.empty and self.without_price.empty and self.duplicates.empty
+
+    def counts(self):
+        return {
+            'Not on pricelist': len(self.not_on_pricelist),
+            'Without a price': len(self.without_price),
+            'Duplicated': len(self.duplicates)
+        }
+
+
+def price_status(df):
+    """PRICED, NOT_ON_PRICELIST or WITHOUT_PRICE for each row
+    in:  dataframe with 'Dealer Price', and 'Price Text' when it came from the pricelist store
+    out: int8 numpy array
+    """
+    if 'Price Text' in df.columns:
+        price = df['Dealer Price']
+        text = df['Price Text'].notna().to_numpy()
+    else:
+        # Read back from an export: text prices are still in 'Dealer Price'
+        price = pd.to_numeric(df['Dealer Price'], errors='coerce')
+        text = (price.isna() & df['Dealer Price'].notna()).to_numpy()
+    listed = price.notna().to_numpy()
+    return np.select([listed, text], [PRICED, WITHOUT_PRICE], NOT_ON_PRICELIST).astype('int8')
+
+
+def check_quality(df, code):
+    """Products not on the pricelist, products without a price and duplicated rows
+    in:  merged dataframe, product code column
+    out: QualityReport; the price reports only keep products with SOH or Sell Out
+    """
+    status = price_status(df)
+    flagged = status != PRICED
+
+    # Both price reports from one groupby, keyed by status first. Identical
+    # (code, description, units) rows count once, as they always have
+    rows = df.loc[flagged, [code, 'Product Description'] + UNIT_COLUMNS]
+    rows.insert(0, 'Status', status[flagged])
+    totals = rows.drop_duplicates().groupby(['Status', code, 'Product Description'], observed=True)[UNIT_COLUMNS].sum()
+    totals = totals[(totals > 0).any(axis=1)]
+    level = totals.index.get_level_values('Status')
+
+    # Duplicates from the row count per key, in order of first appearance
+    keys = [code] + DUPLICATE_KEYS
+    sizes = df.groupby(keys, observed=True, sort=False, dropna=False).size()
+
+    return QualityReport(
+        code=code,
+        not_on_pricelist=totals[level == NOT_ON_PRICELIST].droplevel('Status').reset_index(),
+        without_price=totals[level == WITHOUT_PRICE].droplevel('Status').reset_index(),
+        duplicates=sizes[sizes > 1].index.to_frame(index=False)
+    )
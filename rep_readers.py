@@ -0,0 +1,63 @@
+# One place to read xlsx files, on the fastest engine installed
+import os
+
+import pandas as pd
+
+# Tried in this order unless REP_EXCEL_ENGINE names one
+ENGINES = ['calamine', 'openpyxl']
+
+
+def engine_available(engine):
+    """Whether pandas can read xlsx with the given engine here"""
+    if engine == 'calamine':
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            return False
+        # pandas only knows calamine from 2.2
+        return 'calamine' in getattr(pd.ExcelFile, '_engines', {})
+    if engine == 'openpyxl':
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            return False
+        return True
+    return False
+
+
+def excel_engine():
+    """Picks the engine for read_excel
+    in:  REP_EXCEL_ENGINE environment variable, if set
+    out: engine name
+    """
+    wanted = os.environ.get('REP_EXCEL_ENGINE')
+    if wanted and engine_available(wanted):
+        return wanted
+    for engine in ENGINES:
+        if engine_available(engine):
+            return engine
+    # Let pandas raise its own error about the missing dependency
+    return 'openpyxl'
+
+
+def read_excel(io, **kwargs):
+    """pd.read_excel on the engine chosen by excel_engine
+    in:  path, bytes buffer or uploaded file, read_excel keyword arguments
+    out: dataframe, or dict of dataframes for sheet_name=None
+    """
+    kwargs.setdefault('engine', excel_engine())
+    return pd.read_excel(io, **kwargs)
+
+
+def excel_workbook(io):
+    """pd.ExcelFile on the engine chosen by excel_engine, to read its sheets one at a time
+    in:  path, bytes buffer or uploaded file
+    out: ExcelFile (close it, or use it in a with block)
+    """
+    return pd.ExcelFile(io, engine=excel_engine())
+
+
+def excel_sheet_names(io):
+    """Sheet names of a workbook in workbook order, without reading its cells"""
+    with excel_workbook(io) as workbook:
+        return workbook.sheet_names
@@ -0,0 +1,273 @@
+# The weekly, monthly and SQL upload flows behind the Streamlit pages, with no Streamlit in them,
+# so the pages and the command line run exactly the same steps
+import datetime as dt
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import pandas as pd
+
+from rep_dtypes import apply_dtype_policy, memory_mb, upper_labels
+from rep_ingest import ingest_workbooks
+from rep_monthly import MonthToDate
+from rep_pricelist import PRICELIST_STORE
+from rep_quality import check_quality
+from rep_sidecar import read_weekly_output
+from rep_transform import normalise_labels
+
+BINO = 'Bino'
+EVERYTHING_ELSE = 'Everything Else'
+
+# Date columns that may arrive as datetime64, datetime.date or text depending on the file
+DATE_COLUMNS = ['Week Ending', 'Date SOH was Collected']
+
+# Pricelist columns the Lexar and Sony reports carry next to the price
+ITEM_COLUMNS = ['Brand Code', 'Item Group', 'Item Category Code', 'Inventory Posting Group', 'Model Class', 'Model Name', 'Model Classification']
+
+
+@dataclass(frozen=True)
+class ReportSpec:
+    """What differs between the rep workbooks: their layout, product code, pricelist and report columns"""
+    layout: str
+    code: str
+    detail: str
+    pricelist: str
+    lookups: list
+    columns: list
+    rename: dict = field(default_factory=dict)
+    week_starting: bool = False
+    report_type: str = 'Weekly'
+    month_to_date: bool = True
+
+    @property
+    def month_keys(self):
+        return [self.code, 'Product Description', 'Category', self.detail, 'Rep', 'Retailer']
+
+    @property
+    def monthly_columns(self):
+        return [self.code, 'Product Description', 'Category', self.detail, 'Rep', 'Month Ending', 'Retailer', 'Stock on Hand', 'Sell Out', 'Dealer Price', 'Amount', 'Date Created']
+
+    @property
+    def upload_columns(self):
+        return [self.code, 'Product Description', 'Category', self.detail, 'Rep', 'Week Ending', 'Retailer', 'Week No.', 'Stock on Hand', 'Sell Out', 'Dealer Price', 'Amount', 'Date Created']
+
+
+# Keyed by the rep_transform layout each one reads; don't change the report headings here without the SQL table
+REPORT_SPECS = {
+    '365 Code': ReportSpec(
+        '365 Code', '365 Code', 'Sub-Cat', 'Master Sheet', ['Dealer Price', 'Price Text'],
+        ['365 Code', 'Product Description', 'Category', 'Sub-Cat', 'Rep', 'Week Ending', 'Retailer', 'Week No.', 'Stock on Hand', 'Sell Out', 'Dealer Price', 'Amount', 'Date Created']
+    ),
+    'AX code': ReportSpec(
+        'AX code', 'AX code', 'Capacity', 'Master Sheet', ['Dealer Price', 'Price Text'],
+        ['AX code', 'Product Description', 'Category', 'Capacity', 'Rep', 'Week Ending', 'Retailer', 'Week No.', 'Stock on Hand', 'Sell Out', 'Dealer Price', 'Amount', 'Date Created']
+    ),
+    'Lexar': ReportSpec(
+        'Lexar', 'AX code', 'Capacity', 'Dealer Excl', ITEM_COLUMNS + ['Dealer Price', 'Price Text'],
+        ['365 code', 'Product Description', 'Category', 'Rep'] + ITEM_COLUMNS + ['Week Starting', 'Week Ending', 'Retailer', 'Week No.', 'Stock on Hand', 'Sell Out', 'Dealer Price', 'Amount', 'Date Created'],
+        rename={'AX code': '365 code', 'Capacity': 'Category'}, week_starting=True, report_type='Weekly_Lexar', month_to_date=False
+    ),
+    'Sony': ReportSpec(
+        'Sony', '365 code', 'Sub-Cat', 'Dealer Excl', ITEM_COLUMNS + ['Dealer Price', 'Price Text'],
+        ['365 code', 'Product Description', 'Category', 'Rep'] + ITEM_COLUMNS + ['Week Starting', 'Week Ending', 'Retailer', 'Week No.', 'Stock on Hand', 'Sell Out', 'Dealer Price', 'Amount', 'Date Created'],
+        week_starting=True, report_type='Weekly_Sony', month_to_date=False
+    ),
+}
+
+
+def week_label(number):
+    """'Week 3' for 3, as the rep sheets head their weeks"""
+    return 'Week ' + str(int(number))
+
+
+@dataclass
+class WeeklyReport:
+    """A weekly report and what was found on the way"""
+    final: pd.DataFrame
+    sheets: dict
+    timings: pd.DataFrame
+    quality: object
+    memory_before: float
+    memory_after: float
+    month: str = None
+
+
+def weekly_report(spec, rep_files, pricelist_file, week_use, week_call, date_end, fold=False):
+    """Reads one week from the rep workbooks and prices it
+    in:  ReportSpec, rep workbooks and pricelist (anything with .name and .getvalue()),
+         week number to read, week number to call it, week ending date,
+         whether to fold the week into the month-to-date kept for the Monthly Report
+    out: WeeklyReport, with month set when the week was folded (only specs with month_to_date fold)
+    """
+    # Read and transform the selected week from all rep workbooks
+    final_df, timings = ingest_workbooks(rep_files, spec.layout, weeks=[week_label(week_use)])
+
+    # Filter out retailers containing "unnamed"
+    final_df = final_df[~final_df['Retailer'].str.contains("unnamed", case=False, na=False)]
+
+    # Only the selected week was read, call it the new week number
+    final_df['Week No.'] = week_label(week_call)
+
+    # Change the date to week ending
+    final_df['Week Ending'] = date_end
+    if spec.week_starting:
+        final_df['Week Starting'] = date_end - dt.timedelta(days=6)
+
+    # Compact dtypes once for the rest of the run
+    memory_before = memory_mb(final_df)
+    final_df = apply_dtype_policy(final_df)
+    memory_after = memory_mb(final_df)
+
+    # Import the pricelist into the local store, skipped when this file was imported before
+    pricelist_version = PRICELIST_STORE.import_pricelist(pricelist_file, spec.pricelist)
+
+    # Convert all product codes to UPPER (pricelist codes were upper-cased on import)
+    final_df[spec.code] = upper_labels(final_df[spec.code])
+
+    # Look up only the pricelist columns the report uses
+    final_df = PRICELIST_STORE.attach(final_df, spec.code, pricelist_version, spec.lookups)
+
+    # Check pricelist gaps, missing prices and duplicates in one pass
+    quality = check_quality(final_df, spec.code)
+
+    # Calculate the Amount
+    final_df['Amount'] = final_df['Sell Out'] * final_df['Dealer Price']
+
+    # Add Date Created column with the current datetime
+    final_df['Date Created'] = datetime.now()
+
+    # Don't change these headings. Rather change the ones above
+    final_df = final_df.rename(columns=spec.rename)[spec.columns]
+
+    if not spec.month_to_date:
+        return WeeklyReport(final_df, {'Data': final_df}, timings, quality, memory_before, memory_after)
+
+    # Split the final DataFrame
+    sheets = {
+        BINO: final_df[final_df['Category'] == BINO],
+        EVERYTHING_ELSE: final_df[final_df['Category'] != BINO]
+    }
+
+    if not fold:
+        return WeeklyReport(final_df, sheets, timings, quality, memory_before, memory_after)
+
+    # Fold this week into the month-to-date totals used by the Monthly Report
+    month_to_date = MonthToDate(spec.month_keys, date_end)
+    for sheet, df in sheets.items():
+        month_to_date.fold(sheet, df)
+    return WeeklyReport(final_df, sheets, timings, quality, memory_before, memory_after, month_to_date.month)
+
+
+def read_weekly_outputs(files):
+    """Bino and Everything Else sheets of weekly reports, leaving out files without both
+    in:  weekly reports, xlsx or sidecar (anything with .name and .getvalue())
+    out: (Bino dataframes, Everything Else dataframes)
+    """
+    dfs_bino = []
+    dfs_else = []
+    for uploaded_file in files:
+        all_sheets = read_weekly_output(uploaded_file)
+        df_bino = all_sheets.get(BINO)
+        df_else = all_sheets.get(EVERYTHING_ELSE)
+
+        if df_bino is not None and df_else is not None:
+            dfs_bino.append(df_bino)
+            dfs_else.append(df_else)
+    return dfs_bino, dfs_else
+
+
+@dataclass
+class MonthlyReport:
+    """A month-to-date report; final and sheets are None while the month has no weeks"""
+    weeks: list
+    final: pd.DataFrame = None
+    sheets: dict = None
+
+
+def month_weeks(spec, date_end):
+    """Week endings already folded into the month of date_end, oldest first"""
+    month_to_date = MonthToDate(spec.month_keys, date_end)
+    return sorted(set(month_to_date.weeks(BINO) + month_to_date.weeks(EVERYTHING_ELSE)))
+
+
+def monthly_report(spec, files, date_end, rebuild=False, drop=()):
+    """Folds weekly reports into the month and closes it
+    in:  ReportSpec, weekly reports, month ending date, start the month again from files only,
+         week endings to take out of the month first
+    out: MonthlyReport
+    """
+    # Month-to-date totals for this month, kept between runs
+    month_to_date = MonthToDate(spec.month_keys, date_end)
+    if rebuild:
+        month_to_date.reset()
+    for week in drop:
+        month_to_date.drop(week)
+
+    dfs_bino, dfs_else = read_weekly_outputs(files)
+    if dfs_bino and dfs_else:
+        # Fold the uploaded weeks in; a week already in the month replaces what it added before
+        month_to_date.fold(BINO, pd.concat(dfs_bino, ignore_index=True))
+        month_to_date.fold(EVERYTHING_ELSE, pd.concat(dfs_else, ignore_index=True))
+
+    weeks = month_weeks(spec, date_end)
+    if not weeks:
+        return MonthlyReport(weeks)
+
+    # Sell Out summed and the latest SOH and Dealer Price for each product and retailer
+    df_bino = month_to_date.close(BINO)
+    df_else = month_to_date.close(EVERYTHING_ELSE)
+
+    # Calculate the Amount based on the aggregated Sell Out and Dealer Price
+    df_bino['Amount'] = df_bino['Sell Out'] * df_bino['Dealer Price']
+    df_else['Amount'] = df_else['Sell Out'] * df_else['Dealer Price']
+
+    # Combine the Bino and Everything Else DataFrames for overall statistics
+    final_df = pd.concat([df_bino, df_else], ignore_index=True)
+
+    # Add Date Created column with the current datetime, to the sheets as well
+    date_created = datetime.now()
+    final_df['Date Created'] = date_created
+    df_bino['Date Created'] = date_created
+    df_else['Date Created'] = date_created
+
+    # Add Month Ending to the sheets, reordered to match the weekly report
+    df_bino['Month Ending'] = date_end
+    df_else['Month Ending'] = date_end
+    sheets = {BINO: df_bino[spec.monthly_columns], EVERYTHING_ELSE: df_else[spec.monthly_columns]}
+    return MonthlyReport(weeks, final_df, sheets)
+
+
+def upload_frame(spec, files):
+    """The rows of weekly reports as they go into the SQL table
+    in:  ReportSpec, weekly reports
+    out: (dataframe, QualityReport taken before text prices are coerced), or None when no file had both sheets
+    """
+    dfs_bino, dfs_else = read_weekly_outputs(files)
+    if not (dfs_bino and dfs_else):
+        return None
+
+    # Combine all Bino and Everything Else DataFrames
+    final_df = pd.concat(dfs_bino + dfs_else, ignore_index=True)
+
+    # Fill empty 'Sub-Cat' with a space " " and clean it (as object, since a sidecar keeps it categorical)
+    if 'Sub-Cat' in final_df.columns:
+        final_df['Sub-Cat'] = normalise_labels(final_df['Sub-Cat'].astype(object).fillna(" "), 'Sub-Cat')
+
+    # Dates as datetime64 whichever file they came from, so the same week is stored with the same key
+    for column in DATE_COLUMNS:
+        if column in final_df.columns:
+            final_df[column] = pd.to_datetime(final_df[column])
+
+    # What is about to be loaded that needs attention, before text prices are coerced
+    quality = check_quality(final_df, spec.code)
+
+    # Convert Dealer Price to numeric, setting errors='coerce' to handle non-numeric values
+    final_df['Dealer Price'] = pd.to_numeric(final_df['Dealer Price'], errors='coerce')
+
+    # Calculate the Amount
+    final_df['Amount'] = final_df['Sell Out'] * final_df['Dealer Price']
+
+    # Add Date Created column with the current datetime
+    final_df['Date Created'] = datetime.now()
+
+    # Don't change these headings. Rather change the ones above
+    return final_df[spec.upload_columns], quality
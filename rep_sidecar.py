@@ -0,0 +1,95 @@
+# Weekly output as one Parquet file next to the xlsx, so Monthly and SQL upload skip re-parsing Excel
+import json
+from io import BytesIO
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from rep_cache import read_cached_excel
+
+# Bump when the columns or their meaning change; older readers refuse newer files
+SCHEMA_VERSION = 1
+
+SIDECAR_EXTENSION = 'parquet'
+SHEET_COLUMN = 'Sheet'
+
+
+def sidecar_available():
+    """Whether pyarrow is installed to write and read sidecars"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def to_sidecar(sheets):
+    """Parquet bytes holding every sheet, dtypes included
+    in:  {sheet name: dataframe} with the same columns, in sheet order
+    out: bytes; the schema version and sheet names are in the file metadata
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    frames = [df.reset_index(drop=True) for df in sheets.values()]
+    # One set of categories per column, so the sheets concatenate without falling back to object
+    for column in frames[0].columns:
+        if all(isinstance(df[column].dtype, pd.CategoricalDtype) for df in frames):
+            categories = union_categoricals([df[column] for df in frames], ignore_order=True).categories
+            for df in frames:
+                df[column] = df[column].cat.set_categories(categories)
+
+    df = pd.concat(frames, ignore_index=True)
+    df[SHEET_COLUMN] = pd.Categorical(
+        [name for name, frame in zip(sheets, frames) for _ in range(len(frame))], categories=list(sheets)
+    )
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'rep_schema_version'] = str(SCHEMA_VERSION).encode()
+    metadata[b'rep_sheets'] = json.dumps(list(sheets)).encode()
+    output = BytesIO()
+    pq.write_table(table.replace_schema_metadata(metadata), output)
+    return output.getvalue()
+
+
+def read_sidecar(data):
+    """Sheets back from to_sidecar bytes
+    in:  bytes
+    out: {sheet name: dataframe}, dtypes as written except dates, which are datetime64 like the xlsx gives
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(BytesIO(data))
+    metadata = table.schema.metadata or {}
+    version = int(metadata.get(b'rep_schema_version', 0))
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Sidecar schema version {version} is not supported (expected {SCHEMA_VERSION})")
+
+    df = table.to_pandas()
+    # Plain dates (the week ending) come back as datetime64, as they do from the xlsx
+    for field in table.schema:
+        if pa.types.is_date(field.type):
+            df[field.name] = pd.to_datetime(df[field.name])
+    # Parquet has no second resolution, so datetime64[s] comes back as [ms] unless cast back
+    for column in table.schema.pandas_metadata['columns']:
+        name, numpy_type = column['name'], column['numpy_type']
+        if numpy_type.startswith('datetime64[') and name in df.columns and str(df[name].dtype) != numpy_type:
+            df[name] = df[name].astype(numpy_type)
+
+    sheets = {}
+    for name in json.loads(metadata[b'rep_sheets']):
+        sheet = df[df[SHEET_COLUMN] == name].drop(columns=SHEET_COLUMN)
+        sheets[name] = sheet.reset_index(drop=True)
+    return sheets
+
+
+def read_weekly_output(uploaded_file):
+    """The sheets of a weekly report, from its sidecar when that is what was uploaded
+    in:  uploaded file (anything with .name and .getvalue()), xlsx or sidecar
+    out: {sheet name: dataframe}
+    """
+    if uploaded_file.name.lower().endswith('.' + SIDECAR_EXTENSION):
+        return read_sidecar(uploaded_file.getvalue())
+    return read_cached_excel(uploaded_file, sheet_name=None)
@@ -0,0 +1,275 @@
+# Bulk loading into the SQL fact table, in batches instead of a round trip per row
+import csv
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from rep_loaded import NATURAL_KEY
+
+# 'multi' sends one INSERT with many VALUES rows per batch, 'executemany' hands each batch to the
+# driver in one call, 'infile' streams a temp CSV through LOAD DATA LOCAL INFILE (MySQL only)
+LOAD_METHODS = ('multi', 'executemany', 'infile')
+
+# Overridable with REP_SQL_LOAD_METHOD and REP_SQL_BATCH_ROWS
+DEFAULT_METHOD = os.environ.get('REP_SQL_LOAD_METHOD', 'multi')
+DEFAULT_BATCH_ROWS = int(os.environ.get('REP_SQL_BATCH_ROWS', 5000))
+
+# Bound parameters allowed in one statement; SQLite stops at 32766, MySQL at 65535
+MAX_PARAMETERS = 32766
+
+# Placeholder per DB-API paramstyle, for statements sent straight to the driver
+PLACEHOLDERS = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}
+
+# MySQL cannot index a whole TEXT column, so text key columns are indexed on this many characters
+# (191 four-byte characters fit InnoDB's smallest key prefix limit)
+MYSQL_KEY_PREFIX = 191
+
+# Drops the staging table only if it is the temporary one, never a real table of the same name
+DROP_TEMPORARY = {
+    'mysql': 'DROP TEMPORARY TABLE IF EXISTS {}',
+    'sqlite': 'DROP TABLE IF EXISTS temp.{}',
+    'postgresql': 'DROP TABLE IF EXISTS pg_temp.{}'
+}
+
+
+@dataclass(frozen=True)
+class LoadResult:
+    """What one bulk load did"""
+    table: str
+    method: str
+    rows: int
+    batches: int
+    seconds: float
+    updated: int = 0
+    dropped: int = 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float('inf')
+
+
+def _rows(df):
+    """Rows as tuples of plain Python values, blanks as None, ready for the driver"""
+    columns = []
+    for _, column in df.items():
+        # Timestamps, even inside an object column, go as datetimes; sqlite3 has no adapter for them
+        if pd.api.types.is_datetime64_any_dtype(column.dtype) or (
+            column.dtype == object and pd.api.types.infer_dtype(column, skipna=True) in ('datetime', 'datetime64')
+        ):
+            values = np.array(pd.to_datetime(column).dt.to_pydatetime(), dtype=object)
+        else:
+            values = column.to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = None
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+
+def _insert_sql(df, table, dialect, rows):
+    """INSERT for this many rows at once, with the driver's own placeholders"""
+    placeholder = PLACEHOLDERS.get(dialect.paramstyle)
+    if placeholder is None:
+        raise ValueError(f"Paramstyle {dialect.paramstyle} is not supported")
+    quote = dialect.identifier_preparer.quote
+    columns = ', '.join(quote(str(column)) for column in df.columns)
+    values = '(' + ', '.join([placeholder] * df.shape[1]) + ')'
+    return f"INSERT INTO {quote(table)} ({columns}) VALUES " + ', '.join([values] * rows)
+
+
+def _quote_mysql(name):
+    return '`' + str(name).replace('`', '``') + '`'
+
+
+def _load_infile(df, table, conn):
+    """LOAD DATA LOCAL INFILE from a temp CSV; the engine needs allow_local_infile"""
+    handle, path = tempfile.mkstemp(suffix='.csv')
+    os.close(handle)
+    try:
+        # With no escape character, backslashes stay as they are and an unquoted NULL is a null
+        df.to_csv(path, index=False, header=False, na_rep='NULL', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        columns = ', '.join(_quote_mysql(column) for column in df.columns)
+        conn.execute(text(
+            f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE {_quote_mysql(table)} "
+            "CHARACTER SET utf8mb4 FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            f"LINES TERMINATED BY '\\n' ({columns})"
+        ))
+    finally:
+        os.remove(path)
+
+
+def _check_method(method, batch_rows, df, dialect):
+    """The method and batch size to use, with their defaults filled in"""
+    method = method or DEFAULT_METHOD
+    batch_rows = batch_rows or DEFAULT_BATCH_ROWS
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method {method!r}, expected one of {', '.join(LOAD_METHODS)}")
+    if method == 'infile' and dialect.name != 'mysql':
+        raise ValueError(f"LOAD DATA LOCAL INFILE needs MySQL, not {dialect.name}")
+    if method == 'multi':
+        # One placeholder per cell, so wide frames get fewer rows per statement
+        batch_rows = max(1, min(batch_rows, MAX_PARAMETERS // max(1, df.shape[1])))
+    return method, batch_rows
+
+
+def _insert(conn, df, table, method, batch_rows):
+    """Sends the rows with one of LOAD_METHODS on an open connection
+    out: number of batches sent
+    """
+    if method == 'infile':
+        _load_infile(df, table, conn)
+        return 1
+
+    rows = _rows(df)
+    statements = {}
+    batches = 0
+    for first in range(0, len(rows), batch_rows):
+        batch = rows[first:first + batch_rows]
+        if method == 'multi':
+            # The statement text only changes for the short last batch
+            if len(batch) not in statements:
+                statements[len(batch)] = _insert_sql(df, table, conn.dialect, len(batch))
+            conn.exec_driver_sql(statements[len(batch)], tuple(value for row in batch for value in row))
+        else:
+            conn.exec_driver_sql(_insert_sql(df, table, conn.dialect, 1), batch)
+        batches += 1
+    return batches
+
+
+def bulk_load(df, table, engine, method=None, batch_rows=None):
+    """Appends rows to a table in one transaction, creating it from the dtypes if it is missing, as to_sql does
+    in:  dataframe, table name, SQLAlchemy engine, one of LOAD_METHODS (DEFAULT_METHOD if None),
+         rows per batch (DEFAULT_BATCH_ROWS if None)
+    out: LoadResult; nothing is kept if any batch fails
+    """
+    method, batch_rows = _check_method(method, batch_rows, df, engine.dialect)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        if not inspect(conn).has_table(table):
+            df.head(0).to_sql(table, conn, index=False)
+        batches = _insert(conn, df, table, method, batch_rows)
+    return LoadResult(table, method, len(df), batches, time.perf_counter() - start)
+
+
+def natural_key(code):
+    """Columns that identify one fact row: the product code, then NATURAL_KEY"""
+    return [code] + NATURAL_KEY
+
+
+def ensure_index(engine, table, keys, name, unique=False):
+    """Adds an index over keys to an existing table, unless one over the same columns is there already
+    in:  SQLAlchemy engine, table name, key columns, index name, whether it is unique
+    out: name of the index in use
+    """
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for index in inspector.get_indexes(table):
+            if bool(index.get('unique')) >= unique and list(index['column_names']) == list(keys):
+                return index['name']
+
+        quote = conn.dialect.identifier_preparer.quote
+        columns = []
+        types = {column['name']: column['type'] for column in inspector.get_columns(table)}
+        for key in keys:
+            column = quote(key)
+            # TEXT columns (what to_sql creates for strings) can only be indexed on a prefix in MySQL
+            if conn.dialect.name == 'mysql' and type(types[key]).__name__.upper().endswith('TEXT'):
+                column += f'({MYSQL_KEY_PREFIX})'
+            columns.append(column)
+        kind = 'UNIQUE INDEX' if unique else 'INDEX'
+        conn.execute(text(f"CREATE {kind} {quote(name)} ON {quote(table)} ({', '.join(columns)})"))
+    return name
+
+
+def ensure_unique_key(engine, table, keys):
+    """Adds a unique index over keys to an existing table, unless it has one already
+    in:  SQLAlchemy engine, table name, key columns
+    out: index name
+    """
+    try:
+        return ensure_index(engine, table, keys, f'ux_{table}_natural_key', unique=True)
+    except IntegrityError as error:
+        quote = engine.dialect.identifier_preparer.quote
+        columns = ', '.join(quote(key) for key in keys)
+        raise ValueError(
+            f"{table} already holds more than one row for some {', '.join(keys)}, so the unique key upsert "
+            f"needs cannot be added. Find them with SELECT {columns}, COUNT(*) FROM {quote(table)} GROUP BY "
+            f"{columns} HAVING COUNT(*) > 1, keep one row of each (the latest Date Created), then upload again"
+        ) from error
+
+
+def ensure_report_indexes(engine, table, code):
+    """Composite indexes that let the SQL Stats date range and groupings read only the weeks asked for
+    in:  SQLAlchemy engine, table name, product code column
+    out: index names
+    """
+    return [
+        ensure_index(engine, table, ['Week Ending', 'Retailer'], f'ix_{table}_week_retailer'),
+        ensure_index(engine, table, ['Week Ending', code], f'ix_{table}_week_code')
+    ]
+
+
+def _merge_sql(dialect, table, staging, columns, keys):
+    """INSERT ... SELECT from the staging table that updates rows whose key is already there"""
+    quote = dialect.identifier_preparer.quote
+    names = ', '.join(quote(column) for column in columns)
+    values = [column for column in columns if column not in keys]
+    insert = f"INSERT INTO {quote(table)} ({names}) SELECT {names} FROM {quote(staging)}"
+    if dialect.name == 'mysql':
+        updates = ', '.join(f"{quote(column)} = VALUES({quote(column)})" for column in values)
+        return f"{insert} ON DUPLICATE KEY UPDATE {updates}"
+    if dialect.name in ('sqlite', 'postgresql'):
+        updates = ', '.join(f"{quote(column)} = excluded.{quote(column)}" for column in values)
+        # SQLite needs a WHERE before ON CONFLICT to tell the SELECT from the upsert clause
+        target = ', '.join(quote(key) for key in keys)
+        return f"{insert} WHERE true ON CONFLICT ({target}) DO UPDATE SET {updates}"
+    raise ValueError(f"Upsert is not supported on {dialect.name}")
+
+
+def upsert(df, table, engine, keys, method=None, batch_rows=None):
+    """Loads rows into a staging table, then merges them into table on keys, all in one transaction;
+    loading the same rows again updates them instead of adding them twice
+    in:  dataframe, table name, SQLAlchemy engine, key columns, one of LOAD_METHODS, rows per batch
+    out: LoadResult; rows counts the rows written, updated those whose key was already in the table and
+         dropped those left out because a later row in df has the same key
+    """
+    # Only the last row of each key can end up in the table, so say so rather than let the merge hide it
+    loaded = df.drop_duplicates(keys, keep='last')
+    dropped = len(df) - len(loaded)
+    df = loaded
+    method, batch_rows = _check_method(method, batch_rows, df, engine.dialect)
+    if engine.dialect.name not in DROP_TEMPORARY:
+        raise ValueError(f"Upsert is not supported on {engine.dialect.name}")
+    with engine.begin() as conn:
+        if not inspect(conn).has_table(table):
+            df.head(0).to_sql(table, conn, index=False)
+    # DDL commits on MySQL, so the indexes are settled before the load starts; the read-only
+    # SQL Stats page relies on the report indexes being made here (natural_key puts the code first)
+    ensure_unique_key(engine, table, keys)
+    ensure_report_indexes(engine, table, keys[0])
+
+    staging = f'{table}_staging'
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        quote = conn.dialect.identifier_preparer.quote
+        # A temporary table lives only on this connection and takes no locks on the fact table;
+        # MySQL keeps one left by a failed load on the pooled connection, so clear it first
+        conn.execute(text(DROP_TEMPORARY[conn.dialect.name].format(quote(staging))))
+        conn.execute(text(
+            f"CREATE TEMPORARY TABLE {quote(staging)} AS SELECT {', '.join(quote(str(column)) for column in df.columns)} "
+            f"FROM {quote(table)} WHERE 1 = 0"
+        ))
+        batches = _insert(conn, df, staging, method, batch_rows)
+
+        matches = ' AND '.join(f"f.{quote(key)} = s.{quote(key)}" for key in keys)
+        updated = conn.execute(text(
+            f"SELECT COUNT(*) FROM {quote(staging)} s WHERE EXISTS "
+            f"(SELECT 1 FROM {quote(table)} f WHERE {matches})"
+        )).scalar()
+        conn.execute(text(_merge_sql(conn.dialect, table, staging, [str(column) for column in df.columns], keys)))
+        conn.execute(text(DROP_TEMPORARY[conn.dialect.name].format(quote(staging))))
+    return LoadResult(table, method, len(df), batches, time.perf_counter() - start, updated, dropped)
@@ -0,0 +1,23 @@
+# Local SQLite files kept between runs (pricelists and other lookup state)
+import os
+import sqlite3
+
+# Folder for the local store, overridable with REP_STORE_DIR
+STORE_DIR = os.environ.get('REP_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.rep_store'))
+
+
+def connect(name, store_dir=None):
+    """Opens (creating if needed) one SQLite file in the store
+    in:  file name without extension, folder (defaults to STORE_DIR)
+    out: sqlite3 connection
+    """
+    store_dir = store_dir or STORE_DIR
+    os.makedirs(store_dir, exist_ok=True)
+    con = sqlite3.connect(os.path.join(store_dir, f'{name}.sqlite'), timeout=30)
+    con.execute('PRAGMA journal_mode=WAL')
+    return con
+
+
+def quote(name):
+    """Quotes a column or table name for SQLite"""
+    return '"' + str(name).replace('"', '""') + '"'
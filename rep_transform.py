@@ -0,0 +1,274 @@
+# Shared transform code for the rep sell out & stock on hand reports
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+HEADER_ROWS = 4
+HEADER_SEP = ' | '
+MEASURE_DTYPES = {'Stock on Hand': 'int32', 'Sell Out': 'int32'}
+
+
+@dataclass(frozen=True)
+class Layout:
+    """How one brand lays out its rep sheets"""
+    name: str
+    id_count: int
+    columns: dict
+    code: str
+    parse_dates: bool = False
+    dtypes: dict = field(default_factory=lambda: dict(MEASURE_DTYPES))
+
+
+@dataclass(frozen=True)
+class Plan:
+    """A layout compiled against one sheet header"""
+    layout: Layout
+    id_positions: np.ndarray
+    id_names: list
+    pairs: pd.DataFrame
+
+
+# Compiled plans kept for the headers seen most recently; a long-running page meets many workbooks
+PLAN_ENTRIES = 256
+
+LAYOUTS = {}
+_plans = OrderedDict()
+
+
+def register_layout(name, id_count, columns, code, **kwargs):
+    """Adds a brand layout to the registry
+    in:  layout name, number of product columns, rename map, product code column
+    out: Layout
+    """
+    layout = Layout(name, id_count, columns, code, **kwargs)
+    LAYOUTS[name] = layout
+    return layout
+
+
+register_layout('Lexar', 3, {
+    'Unnamed: 0 | Category': 'Category',
+    'Unnamed: 1 | AX code': 'AX code',
+    'Unnamed: 2 | Product Description': 'Product Description',
+    'Unnamed: 3 | Date SOH was Collected: | Capacity': 'Capacity'
+}, code='AX code')
+
+register_layout('Sony', 6, {
+    'Unnamed: 1 | 365 Code': '365 code',
+    'Unnamed: 2 | Product Description': 'Product Description',
+    'Unnamed: 3 | Category': 'Category',
+    'Unnamed: 4 | Sub-Cat': 'Sub-Cat',
+    'Unnamed: 5 | Date SOH was Collected: | Status': 'Status'
+}, code='365 code')
+
+register_layout('365 Code', 4, {
+    'Unnamed: 0 | 365 Code': '365 Code',
+    'Unnamed: 1 | Product Description': 'Product Description',
+    'Unnamed: 2 | Category': 'Category',
+    'Unnamed: 3 | Date SOH was Collected: | Sub-Cat': 'Sub-Cat'
+}, code='365 Code', parse_dates=True)
+
+register_layout('AX code', 4, {
+    'Unnamed: 0 | AX code': 'AX code',
+    'Unnamed: 1 | Product Description': 'Product Description',
+    'Unnamed: 2 | Date SOH was Collected: | Capacity': 'Capacity'
+}, code='AX code', parse_dates=True)
+
+
+def excel_header_names(row):
+    """Names pandas would give a header row read with header=0
+    in:  first row of a sheet read with header=None
+    out: Index of names ('Unnamed: i' for blanks, '.1', '.2' for repeats)
+    """
+    names = pd.Series(row.to_numpy(), dtype=object)
+    blank = names.isna()
+    names[blank] = 'Unnamed: ' + pd.Series(range(len(names)))[blank].astype(str)
+    names = names.astype(str).tolist()
+
+    # Mangle repeated names the same way read_excel does: named columns first, then the
+    # blanks, each repeat taking the next '.n' of its name not already used in the row
+    counts = {}
+    for i in np.flatnonzero(~blank).tolist() + np.flatnonzero(blank).tolist():
+        name = original = names[i]
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[original] = count + 1
+            name = f'{original}.{count}'
+            count = count + 1 if name in names else counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+
+    return pd.Index(names)
+
+
+def stack_header(raw, header_rows=HEADER_ROWS):
+    """Builds the composite 'Retailer | Date | Week' column labels
+    in:  sheet read with header=None
+    out: Index with one label per column, joined over the first header_rows rows
+    """
+    labels = pd.Series(excel_header_names(raw.iloc[0]), dtype=object)
+
+    # Append each following header row wherever it has a value
+    for i in range(1, header_rows):
+        row = pd.Series(raw.iloc[i].to_numpy(), dtype=object)
+        labels = labels.where(row.isna(), labels + HEADER_SEP + row.astype(str))
+
+    return pd.Index(labels.astype(str))
+
+
+def _blank_to_none(labels):
+    labels = labels.str.strip()
+    return labels.where(labels != '', None)
+
+
+# How each label column is cleaned; every cleaner takes and returns a Series
+LABEL_CLEANERS = {
+    # Strip, then drop the '.1', '.2' pandas adds to repeated retailer headings
+    'Retailer': lambda labels: labels.str.strip().str.replace(r"\.*\d+", "", regex=True),
+    'Week No.': lambda labels: labels.str.strip(),
+    'Sub-Cat': _blank_to_none
+}
+
+# Cleaned value of the labels seen so far, per column; the oldest are forgotten past LABEL_MEMO_ENTRIES
+LABEL_MEMO_ENTRIES = 100000
+_label_memo = {}
+
+
+def normalise_labels(labels, column):
+    """Cleans a label column by cleaning each distinct value once
+    in:  Series of labels, column name in LABEL_CLEANERS
+    out: numpy array of cleaned labels, blanks left as NaN
+    """
+    codes, uniques = pd.factorize(pd.Series(labels, dtype=object))
+    memo = _label_memo.setdefault(column, {})
+
+    # Only values not met in an earlier sheet or file go through the cleaner
+    new = [value for value in uniques if value not in memo]
+    if new:
+        memo.update(zip(new, LABEL_CLEANERS[column](pd.Series(new, dtype=object))))
+
+    # Code -1 (blank) picks the NaN appended at the end
+    cleaned = np.array([memo[value] for value in uniques] + [np.nan], dtype=object)
+
+    # Dicts keep insertion order, so the first keys are the oldest
+    for value in list(memo)[:len(memo) - LABEL_MEMO_ENTRIES]:
+        del memo[value]
+    return cleaned[codes]
+
+
+class PairingError(ValueError):
+    """Raised when a Stock on Hand column has no matching Sell Out column"""
+
+
+def pair_columns(labels, id_count):
+    """Pairs each week's Stock on Hand column with its Sell Out column
+    in:  stacked header labels, number of product columns
+    out: dataframe of SOH and Sell Out column positions, indexed by
+         (Retailer, Date SOH was Collected, Week No.)
+    """
+    labels = pd.Series(labels[id_count:], dtype=object).astype(str)
+    positions = pd.Series(range(id_count, id_count + len(labels)))
+
+    # Sell Out columns carry no week, SOH columns do; anything else (Notes) is dropped
+    is_sell_out = labels.str.contains('Sell Out', regex=False)
+    is_soh = ~is_sell_out & labels.str.contains('Week', regex=False) & ~labels.str.contains('Notes', regex=False)
+
+    # Each Sell Out column belongs to the SOH column before it
+    group = is_soh.cumsum()
+    parts = labels.str.split('|', expand=True).reindex(columns=range(3))
+    retailer = pd.Series(normalise_labels(parts[0], 'Retailer'), index=parts.index)
+
+    soh = pd.DataFrame({'group': group[is_soh], 'position': positions[is_soh], 'Retailer': retailer[is_soh]})
+    sell_out = pd.DataFrame({'group': group[is_sell_out], 'position': positions[is_sell_out], 'Retailer': retailer[is_sell_out]})
+
+    # A Sell Out column before the first week or a second one in the same week has no SOH to pair with
+    extra = (sell_out['group'] == 0) | sell_out['group'].duplicated()
+    if extra.any():
+        raise PairingError(f"No matching SOH column for: {labels[extra[extra].index].tolist()}")
+
+    pairs = soh.merge(sell_out, on='group', how='left', suffixes=('', ' Sell Out'))
+
+    # Merged retailer cells leave the Sell Out column unnamed, which still pairs
+    other_retailer = (pairs['Retailer'] != pairs['Retailer Sell Out']) & \
+        ~pairs['Retailer Sell Out'].str.startswith('Unnamed', na=False)
+    unmatched = pairs['position Sell Out'].isna() | other_retailer
+    if unmatched.any():
+        missing = labels[pairs.loc[unmatched, 'position'] - id_count].tolist()
+        raise PairingError(f"No matching Sell Out column for: {missing}")
+
+    index = pd.MultiIndex.from_arrays([
+        pairs['Retailer'],
+        parts[1][is_soh].to_numpy(),
+        normalise_labels(parts[2][is_soh], 'Week No.')
+    ], names=['Retailer', 'Date SOH was Collected', 'Week No.'])
+    return pd.DataFrame({
+        'Stock on Hand': pairs['position'].to_numpy(),
+        'Sell Out': pairs['position Sell Out'].astype(int).to_numpy()
+    }, index=index)
+
+
+def header_fingerprint(raw):
+    """Hashes the header rows of a sheet so sheets with the same header share a plan"""
+    header = raw.iloc[:HEADER_ROWS].to_numpy(dtype=object).tolist()
+    return raw.shape[1], hashlib.sha1(repr(header).encode()).hexdigest()
+
+
+def compile_layout(raw, layout):
+    """Works out column positions for a sheet, reusing the plan for a header seen before
+    in:  sheet read with header=None, Layout
+    out: Plan
+    """
+    key = (layout.name, header_fingerprint(raw))
+    plan = _plans.get(key)
+    if plan is not None:
+        _plans.move_to_end(key)
+    else:
+        new_header = stack_header(raw)
+        plan = Plan(
+            layout=layout,
+            id_positions=np.arange(layout.id_count),
+            id_names=new_header[:layout.id_count].map(lambda name: layout.columns.get(name, name)).tolist(),
+            pairs=pair_columns(new_header, layout.id_count)
+        )
+        _plans[key] = plan
+        while len(_plans) > PLAN_ENTRIES:
+            _plans.popitem(last=False)
+    return plan
+
+
+def transform_data(raw, layout, weeks=None):
+    """Unpivots one rep sheet into one row per product, retailer and week
+    in:  sheet read with header=None, Layout (or its name in LAYOUTS),
+         week labels to keep such as ['Week 3'] (None for all weeks)
+    out: dataframe with Stock on Hand and Sell Out per retailer and week
+    """
+    if isinstance(layout, str):
+        layout = LAYOUTS[layout]
+    plan = compile_layout(raw, layout)
+    pairs = plan.pairs
+
+    # Only the selected weeks' columns are sliced out of the sheet
+    if weeks is not None:
+        pairs = pairs[pairs.index.get_level_values('Week No.').isin(weeks)]
+    data = raw.iloc[HEADER_ROWS:]
+    rows = len(data)
+
+    # Product columns repeat once per SOH/Sell Out pair
+    df = data.iloc[np.tile(np.arange(rows), len(pairs)), plan.id_positions].reset_index(drop=True)
+    df.columns = plan.id_names
+
+    # Take each pair's values column by column, in header order
+    for measure, dtype in layout.dtypes.items():
+        values = data.iloc[:, pairs[measure]].to_numpy().ravel(order='F')
+        df[measure] = pd.to_numeric(pd.Series(values), errors='coerce').fillna(0).astype(dtype)
+
+    for level in pairs.index.names:
+        df[level] = pairs.index.get_level_values(level).repeat(rows)
+
+    # Convert 'Date SOH was Collected' column to date type
+    if layout.parse_dates:
+        df['Date SOH was Collected'] = pd.to_datetime(df['Date SOH was Collected']).dt.date
+
+    return df
@@ -0,0 +1,75 @@
+# Picking the rows to show on screen, so only one page of a big frame goes to the browser
+import math
+
+import numpy as np
+import pandas as pd
+
+# Rows per page of the final frame, and rows shown of a diagnostic table before it is cut
+PAGE_ROWS = 200
+TABLE_ROWS = 100
+
+# Product code columns the scripts use, the first one present is the one filtered on
+CODE_COLUMNS = ['365 Code', '365 code', 'AX code']
+
+
+def code_column(columns):
+    """The product code column among columns, None when there is none"""
+    return next((column for column in CODE_COLUMNS if column in columns), None)
+
+
+def labels(values):
+    """Distinct labels of a column in order, for a filter's options; categories that have rows only"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.remove_unused_categories().cat.categories.to_series()
+    return sorted(values.dropna().astype(str).unique())
+
+
+def _sort_key(values):
+    """Values to argsort a column by: categories by their label rather than their code, blanks last"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        ranks = np.argsort(np.argsort(values.cat.categories.to_numpy(dtype=object).astype(str), kind='stable'))
+        return np.where(codes >= 0, ranks[codes], len(ranks))
+    return values
+
+
+def matching(df, filters=None):
+    """Which rows pass every filter
+    in:  dataframe, {column: values to keep} or {column: text the value starts with}; empty ones are ignored
+    out: boolean numpy array
+    """
+    keep = np.ones(len(df), dtype=bool)
+    for column, wanted in (filters or {}).items():
+        if wanted is None or len(wanted) == 0:
+            continue
+        values = df[column]
+        if isinstance(wanted, str):
+            # Each distinct label is checked once, then looked up per row
+            codes, uniques = pd.factorize(values)
+            hits = pd.Index(uniques).astype(str).str.upper().str.startswith(wanted.strip().upper())
+            keep &= (codes >= 0) & np.append(np.asarray(hits, dtype=bool), False)[codes]
+        else:
+            keep &= values.isin(list(wanted)).to_numpy()
+    return keep
+
+
+def page_of(df, filters=None, sort_by=None, descending=False, page=1, rows=PAGE_ROWS):
+    """One page of df after filtering and sorting, working on row positions so the frame itself is not copied
+    in:  dataframe, filters as for matching, column to sort by (None keeps the order), descending or not,
+         page number from 1, rows per page
+    out: (page as a dataframe, rows matching, number of pages)
+    """
+    positions = np.flatnonzero(matching(df, filters))
+    if sort_by is not None:
+        key = pd.Series(_sort_key(df[sort_by].iloc[positions])).reset_index(drop=True)
+        order = key.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+        positions = positions[order]
+    pages = max(1, math.ceil(len(positions) / rows))
+    page = min(max(1, int(page)), pages)
+    first = (page - 1) * rows
+    return df.iloc[positions[first:first + rows]], len(positions), pages
+
+
+def cap_rows(df, rows=TABLE_ROWS):
+    """The first rows of a table to render, and whether anything was left out"""
+    return df.head(rows), len(df) > rows
@@ -0,0 +1,9 @@
+# The tests import the rep modules from the repository root and keep their local store out of it
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Set before any rep module reads it; every singleton store in the run shares this folder
+os.environ.setdefault('REP_STORE_DIR', tempfile.mkdtemp(prefix='rep_store_'))
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from rep_aggregate import latest_snapshot
+
+
+def sort_then_last(df, keys, sums, snapshots):
+    """What latest_snapshot stands in for: a stable sort by date (blanks last), then groupby last"""
+    df = df.sort_values(by='Date', kind='stable', na_position='last')
+    return df.groupby(keys).agg({**{column: 'sum' for column in sums}, **{column: 'last' for column in snapshots}})
+
+
+def test_newest_value_per_group_with_blank_dates_last_and_the_later_row_on_a_tie():
+    df = pd.DataFrame({
+        'Code': ['A', 'A', 'A', 'B', 'B', 'B', 'C', 'C'],
+        'Date': pd.to_datetime(['2024-05-05', None, '2024-05-12',
+                                '2024-05-12', '2024-05-12', '2024-05-05',
+                                '2024-05-12', '2024-05-05']),
+        'Sell Out': [1, 2, 3, 4, 5, 6, 7, 8],
+        'Stock on Hand': [10.0, 20.0, 30.0, 40.0, 50.0, 60.0, np.nan, 80.0],
+    })
+    result = latest_snapshot(df, ['Code'], ['Sell Out'], ['Stock on Hand'], sort=True)
+
+    # A: the row without a date counts as the newest; B: two rows on the newest date, the later one wins;
+    # C: the newest row has no SOH, so the newest one that has
+    assert result['Stock on Hand'].tolist() == [20.0, 50.0, 80.0]
+    assert result['Sell Out'].tolist() == [6, 15, 15]
+    pd.testing.assert_frame_equal(result, sort_then_last(df, ['Code'], ['Sell Out'], ['Stock on Hand']))
+
+
+def test_matches_sort_then_last_on_shuffled_weeks():
+    rng = np.random.default_rng(0)
+    rows = 5000
+    df = pd.DataFrame({
+        'Code': rng.choice([f'SN{i}' for i in range(300)], rows),
+        'Retailer': rng.choice(['Makro', 'Game', 'Takealot'], rows),
+        'Date': pd.Timestamp('2024-05-05') + pd.to_timedelta(rng.integers(0, 5, rows) * 7, unit='D'),
+        'Sell Out': rng.integers(0, 20, rows),
+        'Stock on Hand': rng.integers(0, 50, rows).astype('float64'),
+        'Dealer Price': rng.uniform(50, 500, rows).round(2),
+    })
+    df.loc[df.index % 7 == 0, 'Stock on Hand'] = np.nan
+    df.loc[df.index % 31 == 0, 'Date'] = pd.NaT
+
+    keys, sums, snapshots = ['Code', 'Retailer'], ['Sell Out'], ['Stock on Hand', 'Dealer Price']
+    pd.testing.assert_frame_equal(latest_snapshot(df, keys, sums, snapshots, sort=True),
+                                  sort_then_last(df, keys, sums, snapshots))
+
+
+def test_with_dates_gives_the_date_of_the_value_taken():
+    df = pd.DataFrame({
+        'Code': ['A', 'A', 'B'],
+        'SOH Date': pd.to_datetime(['2024-05-12', '2024-05-05', None]),
+        'Stock on Hand': [5, 7, 9],
+    })
+    result = latest_snapshot(df, ['Code'], snapshots=['Stock on Hand'], date={'Stock on Hand': 'SOH Date'},
+                             with_dates=True, sort=True)
+    assert result['Stock on Hand'].tolist() == [5, 9]
+    assert result['SOH Date'].tolist() == [pd.Timestamp('2024-05-12'), pd.NaT]
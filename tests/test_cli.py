@@ -0,0 +1,41 @@
+import datetime as dt
+import glob
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from benchmarks.workbooks import pricelist_workbook, rep_workbook
+from rep_cli import main
+
+
+@pytest.fixture
+def weekly_xlsx(tmp_path):
+    """A 365 Code weekly report written by the CLI from a rep workbook, as xlsx"""
+    (tmp_path / 'reps').mkdir()
+    (tmp_path / 'reps' / 'rep.xlsx').write_bytes(rep_workbook(reps=2, products=50, retailers=['Makro', 'Game'], weeks=3))
+    (tmp_path / 'pricelist.xlsx').write_bytes(pricelist_workbook(products=60))
+    assert main(['weekly', '--layout', '365', '--week-use', '1', '--week-call', '1', '--week-ending', '2024-05-12',
+                 '--pricelist', str(tmp_path / 'pricelist.xlsx'), '--out', str(tmp_path / 'weekly'),
+                 str(tmp_path / 'reps' / '*.xlsx')]) == 0
+    [path] = glob.glob(str(tmp_path / 'weekly' / '*_Weekly_transformed_data.xlsx'))
+    return path
+
+
+def test_monthly_from_xlsx(weekly_xlsx, tmp_path):
+    assert main(['monthly', '--layout', '365', '--month-ending', '2024-05-31', '--rebuild',
+                 '--out', str(tmp_path / 'monthly'), weekly_xlsx]) == 0
+    sheets = pd.read_excel(tmp_path / 'monthly' / '2024-05-31_Monthly_transformed_data.xlsx', sheet_name=None)
+    assert list(sheets) == ['Bino', 'Everything Else']
+    assert sum(len(df) for df in sheets.values()) == 2 * 2 * 50
+
+
+def test_upload_from_xlsx(weekly_xlsx, tmp_path, monkeypatch):
+    # --url wins over REP_SQL_URL
+    monkeypatch.setenv('REP_SQL_URL', f"sqlite:///{tmp_path / 'other.sqlite'}")
+    url = f"sqlite:///{tmp_path / 'upload.sqlite'}"
+    assert main(['upload', '--layout', '365', '--url', url, weekly_xlsx]) == 0
+    stored = pd.read_sql('SELECT * FROM fact_repsellout', create_engine(url))
+    assert len(stored) == 2 * 2 * 50
+    assert pd.to_datetime(stored['Week Ending']).dt.date.unique().tolist() == [dt.date(2024, 5, 12)]
+    assert not (tmp_path / 'other.sqlite').exists()
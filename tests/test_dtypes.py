@@ -0,0 +1,28 @@
+import pandas as pd
+
+from benchmarks.workbooks import weekly_frame
+from rep_dtypes import apply_dtype_policy, upper_labels
+
+
+def test_labels_become_categorical_units_int32_and_prices_stay_float64():
+    df = weekly_frame(500)
+    compact = apply_dtype_policy(df)
+
+    for column in ('365 Code', 'Category', 'Rep', 'Retailer', 'Week No.'):
+        assert isinstance(compact[column].dtype, pd.CategoricalDtype)
+    assert compact[['Stock on Hand', 'Sell Out']].dtypes.eq('int32').all()
+    # float32 would put 4999.99 out by a fraction of a cent, and Amount with it
+    assert compact[['Dealer Price', 'Amount']].dtypes.eq('float64').all()
+    pd.testing.assert_series_equal(compact['Dealer Price'], df['Dealer Price'])
+    assert (compact['Sell Out'] * compact['Dealer Price']).equals(df['Amount'])
+    # The input frame is left as it was
+    assert df['Sell Out'].dtype == 'int64'
+
+
+def test_upper_labels_keeps_categoricals_categorical():
+    codes = pd.Series(['sn1', 'SN2', 'sn1'], dtype='category')
+    upper = upper_labels(codes)
+    assert isinstance(upper.dtype, pd.CategoricalDtype)
+    assert upper.tolist() == ['SN1', 'SN2', 'SN1']
+    # Categories that only differ by case are merged
+    assert upper_labels(pd.Series(['sn1', 'SN1'], dtype='category')).cat.categories.tolist() == ['SN1']
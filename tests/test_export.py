@@ -0,0 +1,29 @@
+import datetime as dt
+from io import BytesIO
+
+import pandas as pd
+
+from rep_export import write_xlsx
+
+
+def test_xlsx_written_in_chunks_reads_back_the_same():
+    rows = 25
+    df = pd.DataFrame({
+        'Code': pd.Series([f'SN{i:03d}' for i in range(rows)], dtype=object),
+        'Category': pd.Categorical(['Bino', 'Camera'] * 12 + ['Bino']),
+        'Sell Out': range(rows),
+        'Dealer Price': [1.5] * rows,
+        'Week Ending': [dt.date(2024, 5, 12)] * rows,
+        'Date Created': pd.Timestamp('2024-05-13 08:30:00'),
+        # Blank through the first chunks, so a chunk on its own can't tell the column's type
+        'Notes': pd.Series([None] * 20 + ['late'] * 5, dtype=object),
+    })
+    back = pd.read_excel(BytesIO(write_xlsx({'Data': df}, chunk_rows=7)), sheet_name='Data')
+    whole = pd.read_excel(BytesIO(write_xlsx({'Data': df}, chunk_rows=1000)), sheet_name='Data')
+    pd.testing.assert_frame_equal(back, whole)
+    assert back['Code'].tolist() == df['Code'].tolist()
+    assert back['Category'].tolist() == df['Category'].tolist()
+    assert back['Sell Out'].tolist() == list(range(rows))
+    assert back['Week Ending'].dt.date.unique().tolist() == [dt.date(2024, 5, 12)]
+    assert back['Date Created'].unique().tolist() == [pd.Timestamp('2024-05-13 08:30:00')]
+    assert back['Notes'].isna().sum() == 20 and (back['Notes'].dropna() == 'late').all()
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from benchmarks.workbooks import rep_workbook
+from rep_cache import ParseCache
+from rep_ingest import ingest_workbooks
+
+
+class Upload:
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+
+    def getvalue(self):
+        return self.data
+
+
+def test_workers_split_one_workbook_by_sheet_and_match_the_serial_read():
+    files = [Upload('reps.xlsx', rep_workbook(reps=3, products=40, weeks=3))]
+    serial, serial_timings = ingest_workbooks(files, '365 Code', workers=1, cache=None)
+    parallel, timings = ingest_workbooks(files, '365 Code', workers=3, cache=None)
+
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert serial['Rep'].unique().tolist() == ['Rep 0', 'Rep 1', 'Rep 2']
+    # One timing row per sheet, each with the process that read it
+    for table in (serial_timings, timings):
+        assert table[['File', 'Sheet', 'From']].to_dict('records') == [
+            {'File': 'reps.xlsx', 'Sheet': f'Rep {i}', 'From': 'file'} for i in range(3)
+        ]
+        assert table['Worker'].notna().all() and (table['Seconds'] > 0).all()
+
+
+def test_workers_keep_upload_order_and_fill_the_transform_cache():
+    files = [Upload(f'reps {i}.xlsx', rep_workbook(reps=2, products=20 + i, weeks=2)) for i in range(2)]
+    cache = ParseCache()
+    first, _ = ingest_workbooks(files, '365 Code', weeks=['Week 1'], workers=2, cache=cache)
+    again, timings = ingest_workbooks(files, '365 Code', weeks=['Week 1'], workers=2, cache=cache)
+
+    pd.testing.assert_frame_equal(again, first)
+    assert timings['From'].tolist() == ['cache'] * 4
+    assert timings['File'].tolist() == ['reps 0.xlsx', 'reps 0.xlsx', 'reps 1.xlsx', 'reps 1.xlsx']
+
+
+def test_another_week_after_a_parallel_read_comes_from_the_sheet_cache():
+    files = [Upload('reps.xlsx', rep_workbook(reps=2, products=20, weeks=3))]
+    cache = ParseCache()
+    ingest_workbooks(files, '365 Code', weeks=['Week 1'], workers=2, cache=cache)
+    week, timings = ingest_workbooks(files, '365 Code', weeks=['Week 2'], workers=2, cache=cache)
+
+    assert timings['From'].tolist() == ['sheet cache', 'sheet cache']
+    fresh, _ = ingest_workbooks(files, '365 Code', weeks=['Week 2'], workers=1, cache=None)
+    pd.testing.assert_frame_equal(week, fresh)
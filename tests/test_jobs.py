@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+import rep_jobs
+from benchmarks.workbooks import weekly_frame
+from rep_jobs import UploadJobs
+from rep_loaded import LoadedKeyIndex
+from rep_sqlload import natural_key, upsert
+
+TABLE = 'fact_repsellout'
+KEYS = natural_key('365 Code')
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return UploadJobs(store_dir=str(tmp_path), loaded_keys=LoadedKeyIndex(store_dir=str(tmp_path)))
+
+
+def wait(jobs, job, timeout=30):
+    deadline = time.monotonic() + timeout
+    status = jobs.status(job)
+    while not status.finished:
+        assert time.monotonic() < deadline, status
+        time.sleep(0.05)
+        status = jobs.status(job)
+    return status
+
+
+def test_status_counts_rows_written_and_repeated_keys(jobs, engine):
+    df = weekly_frame(3000, seed=2)
+    unique = len(df.drop_duplicates(KEYS))
+    assert unique < len(df)
+
+    status = wait(jobs, jobs.submit(df, engine, '365 Code', TABLE, batch_rows=700))
+    assert status.state == 'done'
+    assert (status.rows, status.dropped) == (unique, len(df) - unique)
+    assert len(pd.read_sql(f'SELECT 1 FROM {TABLE}', engine)) == unique
+
+
+def test_resume_carries_on_from_the_batch_that_failed(jobs, engine, monkeypatch):
+    df = weekly_frame(3000, seed=3).drop_duplicates(KEYS)
+    calls = []
+
+    def flaky(rows, *args, **kwargs):
+        calls.append(len(rows))
+        if len(calls) == 3:
+            raise ConnectionError('server went away')
+        return upsert(rows, *args, **kwargs)
+
+    monkeypatch.setattr(rep_jobs, 'upsert', flaky)
+    job = jobs.submit(df, engine, '365 Code', TABLE, batch_rows=700)
+    status = wait(jobs, job)
+    assert (status.state, status.done) == ('failed', 2)
+    assert 'server went away' in status.error
+
+    jobs.resume(job, engine)
+    status = wait(jobs, job)
+    assert (status.state, status.done, status.rows) == ('done', status.batches, len(df))
+    # The two committed batches are not sent again
+    assert sum(calls) == len(df) + calls[2]
+    assert len(pd.read_sql(f'SELECT 1 FROM {TABLE}', engine)) == len(df)
+
+
+def test_quick_reruns_with_the_same_rows_queue_the_job_once(jobs, engine, monkeypatch):
+    df = weekly_frame(2000, seed=4).drop_duplicates(KEYS)
+    start = jobs._start
+
+    def slow_start(job, engine):
+        # Widens the gap between checking for the job and queueing it
+        time.sleep(0.05)
+        start(job, engine)
+
+    monkeypatch.setattr(jobs, '_start', slow_start)
+    submitted = []
+    threads = [threading.Thread(target=lambda: submitted.append(jobs.submit(df, engine, '365 Code', TABLE, batch_rows=500)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(submitted)) == 1
+    status = wait(jobs, submitted[0])
+    assert (status.state, status.rows, status.error) == ('done', len(df), None)
+
+
+def test_a_job_queued_again_after_it_is_done_is_left_alone(jobs, engine):
+    job = jobs.submit(weekly_frame(300, seed=5).drop_duplicates(KEYS), engine, '365 Code', TABLE)
+    done = wait(jobs, job)
+    with jobs._lock:
+        jobs._engines[job] = engine
+        jobs._queue.put(job)
+    jobs._queue.join()
+    assert jobs.status(job) == done
@@ -0,0 +1,90 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.workbooks import weekly_frame
+from rep_kpis import SqlKpis, frame_kpis
+from rep_sqlload import natural_key, upsert
+
+TABLE = 'fact_repsellout'
+FIRST = dt.date(2024, 5, 5)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    yield engine
+    engine.dispose()
+
+
+def load(engine, df):
+    upsert(df.drop_duplicates(natural_key('365 Code'), keep='last'), TABLE, engine, natural_key('365 Code'))
+
+
+def assert_same_kpis(result, expected):
+    for total in ('total_amount', 'bino_amount', 'total_units', 'bino_units'):
+        assert getattr(result, total) == pytest.approx(getattr(expected, total))
+    for table in ('top_products', 'top_retailers'):
+        pd.testing.assert_frame_equal(getattr(result, table), getattr(expected, table), check_dtype=False)
+
+
+def test_sql_kpis_match_the_frame_kpis_over_the_same_weeks(engine):
+    weeks = [weekly_frame(2000, FIRST + dt.timedelta(weeks=i), seed=i) for i in range(4)]
+    df = pd.concat(weeks, ignore_index=True).drop_duplicates(natural_key('365 Code'), keep='last')
+    load(engine, df)
+
+    start, end = FIRST + dt.timedelta(weeks=1), FIRST + dt.timedelta(weeks=2)
+    in_range = df[df['Week Ending'].between(pd.Timestamp(start), pd.Timestamp(end))]
+    assert_same_kpis(SqlKpis(engine, TABLE).kpis(start, end), frame_kpis(in_range))
+
+
+def test_the_end_date_takes_in_the_whole_day(engine):
+    df = weekly_frame(300, FIRST, seed=1)
+    # Stored with a time of day, as a datetime read back from Excel can be
+    df['Week Ending'] = pd.Timestamp(FIRST) + pd.Timedelta(hours=10)
+    next_week = weekly_frame(300, FIRST + dt.timedelta(weeks=1), seed=2)
+    load(engine, pd.concat([df, next_week], ignore_index=True))
+
+    kpis = SqlKpis(engine, TABLE).kpis(FIRST, FIRST)
+    loaded = df.drop_duplicates(natural_key('365 Code'), keep='last')
+    assert kpis.total_units == loaded['Sell Out'].sum()
+    # The week after the end date starts at midnight and is left out
+    assert SqlKpis(engine, TABLE).kpis(FIRST - dt.timedelta(days=6), FIRST - dt.timedelta(days=1)).total_units == 0
+
+
+def test_the_upload_makes_the_report_indexes(engine):
+    load(engine, weekly_frame(100))
+    names = {index['name'] for index in inspect(engine).get_indexes(TABLE)}
+    assert {f'ix_{TABLE}_week_retailer', f'ix_{TABLE}_week_code'} <= names
+
+
+def test_no_table_yet_gives_no_kpis(engine):
+    assert SqlKpis(engine, TABLE).kpis(FIRST, FIRST) is None
+
+
+def baseline_stats(df):
+    """The totals and top 10 tables df_stats worked out before frame_kpis"""
+    bino = df[df['Category'] == 'Bino']
+    tops = [df.groupby(by).agg({'Amount': 'sum', 'Sell Out': 'sum'}).sort_values('Amount', ascending=False)[['Sell Out', 'Amount']].head(10)
+            for by in ('Product Description', 'Retailer')]
+    return df['Amount'].sum(), bino['Amount'].sum(), df['Sell Out'].sum(), bino['Sell Out'].sum(), tops
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_frame_kpis_match_the_baseline_df_stats(categorical):
+    df = weekly_frame(5000, seed=8)
+    if categorical:
+        df = df.astype({column: 'category' for column in ('Category', 'Product Description', 'Retailer')})
+    total_amount, bino_amount, total_units, bino_units, (products, retailers) = baseline_stats(df)
+
+    for kpis in (frame_kpis(df), frame_kpis(df)):
+        assert (kpis.total_amount, kpis.bino_amount) == (pytest.approx(total_amount), pytest.approx(bino_amount))
+        assert (kpis.total_units, kpis.bino_units) == (total_units, bino_units)
+        assert kpis.other_units == total_units - bino_units
+        pd.testing.assert_frame_equal(kpis.top_products, products, check_dtype=False, check_index_type=False,
+                                      check_categorical=False)
+        pd.testing.assert_frame_equal(kpis.top_retailers, retailers, check_dtype=False, check_index_type=False,
+                                      check_categorical=False)
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from benchmarks.workbooks import weekly_frame
+from rep_loaded import DEFAULT_TARGET, LoadedKeyIndex, database_key
+
+
+@pytest.fixture
+def index(tmp_path):
+    return LoadedKeyIndex(store_dir=str(tmp_path / 'store'))
+
+
+def sqlite_engine(path):
+    return create_engine(f'sqlite:///{path}')
+
+
+def test_rows_already_in_the_table_are_found_in_that_database_only(index, tmp_path):
+    df = weekly_frame(500, seed=4)
+    loaded = sqlite_engine(tmp_path / 'loaded.sqlite')
+    other = sqlite_engine(tmp_path / 'other.sqlite')
+    # Loaded before the index was kept, or by another instance
+    df.head(300).to_sql(DEFAULT_TARGET, loaded, index=False)
+    df.head(300).to_sql(DEFAULT_TARGET, other, index=False)
+    other.dispose()
+
+    assert index.contains(df, '365 Code', loaded).tolist() == [True] * 300 + [False] * 200
+    fresh = sqlite_engine(tmp_path / 'fresh.sqlite')
+    assert not index.contains(df, '365 Code', fresh).any()
+    # Same table name in a database that has not been loaded to through the index
+    assert not index.contains(df, '365 Code', loaded, 'fact_other').any()
+
+
+def test_seeding_reads_the_table_once_unless_refreshed(index, tmp_path):
+    df = weekly_frame(200, seed=5)
+    engine = sqlite_engine(tmp_path / 'db.sqlite')
+    df.to_sql(DEFAULT_TARGET, engine, index=False)
+
+    assert index.seed(engine, '365 Code', chunk_rows=64) == 200
+    assert index.seed(engine, '365 Code') == 0
+    assert index.seed(engine, '365 Code', refresh=True) == 200
+    assert index.contains(df, '365 Code', engine).all()
+
+
+def test_a_missing_table_seeds_nothing_and_loads_are_recorded(index, tmp_path):
+    df = weekly_frame(100, seed=6)
+    engine = sqlite_engine(tmp_path / 'db.sqlite')
+    assert not index.contains(df, '365 Code', engine).any()
+    index.record(df.head(10), '365 Code', engine)
+    assert index.contains(df, '365 Code', engine).sum() == 10
+
+
+def test_the_password_is_not_part_of_the_database_key():
+    assert 'secret' not in database_key('mysql+pymysql://rep:secret@db:3306/sales')
+    assert database_key('mysql+pymysql://rep:secret@db:3306/sales') == database_key('mysql+pymysql://rep:changed@db:3306/sales')
+
+
+def test_stores_from_before_the_database_was_kept_are_upgraded(tmp_path):
+    store = tmp_path / 'store'
+    store.mkdir()
+    with sqlite3.connect(store / 'loaded_keys.sqlite') as con:
+        con.execute('CREATE TABLE loaded_batches (batch INTEGER PRIMARY KEY AUTOINCREMENT, '
+                    'target TEXT, loaded_at TEXT, rows INTEGER, keys BLOB)')
+    index = LoadedKeyIndex(store_dir=str(store))
+    engine = sqlite_engine(tmp_path / 'db.sqlite')
+    df = weekly_frame(50, seed=7)
+    index.record(df, '365 Code', engine)
+    assert index.contains(df, '365 Code', engine).all()
@@ -0,0 +1,53 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+from benchmarks.workbooks import weekly_frame
+from rep_monthly import MonthToDate
+
+KEYS = ['365 Code', 'Product Description', 'Category', 'Sub-Cat', 'Rep', 'Retailer']
+
+
+@pytest.fixture
+def month(tmp_path):
+    return MonthToDate(KEYS, dt.date(2024, 5, 31), store_dir=str(tmp_path))
+
+
+def week(day, seed):
+    return weekly_frame(300, week_ending=dt.date(2024, 5, day), seed=seed)
+
+
+def test_fold_sums_sell_out_over_the_weeks(month):
+    weeks = [week(5, 0), week(12, 1)]
+    for df in weeks:
+        month.fold('Everything Else', df)
+    assert month.weeks('Everything Else') == ['2024-05-05', '2024-05-12']
+    assert month.close('Everything Else')['Sell Out'].sum() == sum(df['Sell Out'].sum() for df in weeks)
+
+
+def test_folding_a_week_again_replaces_it(month):
+    month.fold('Everything Else', week(5, 0))
+    month.fold('Everything Else', week(12, 1))
+    corrected = week(5, 2)
+    month.fold('Everything Else', corrected)
+    assert month.weeks('Everything Else') == ['2024-05-05', '2024-05-12']
+    assert month.close('Everything Else')['Sell Out'].sum() == corrected['Sell Out'].sum() + week(12, 1)['Sell Out'].sum()
+
+
+def test_drop_takes_one_week_out_of_every_sheet(month):
+    for sheet in ('Bino', 'Everything Else'):
+        month.fold(sheet, week(5, 0))
+        month.fold(sheet, week(12, 1))
+    assert month.drop(dt.date(2024, 5, 5))
+    assert not month.drop(dt.date(2024, 5, 19))
+    for sheet in ('Bino', 'Everything Else'):
+        assert month.weeks(sheet) == ['2024-05-12']
+        assert month.close(sheet)['Sell Out'].sum() == week(12, 1)['Sell Out'].sum()
+
+
+def test_dropping_the_last_week_empties_the_month(month):
+    month.fold('Bino', week(5, 0))
+    month.drop(pd.Timestamp('2024-05-05'))
+    assert month.weeks('Bino') == []
+    assert month.close('Bino').empty
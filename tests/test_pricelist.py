@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+import rep_pricelist
+from benchmarks.workbooks import pricelist_frame, pricelist_workbook
+from rep_pricelist import PricelistStore
+
+
+class Upload:
+    def __init__(self, data, name='pricelist.xlsx'):
+        self.data = data
+        self.name = name
+
+    def getvalue(self):
+        return self.data
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PricelistStore(store_dir=str(tmp_path))
+
+
+def test_importing_the_same_file_again_does_nothing(store, monkeypatch):
+    upload = Upload(pricelist_workbook(200))
+    version = store.import_pricelist(upload, 'Master Sheet')
+
+    def read_excel(*args, **kwargs):
+        raise AssertionError('the pricelist was read again')
+
+    monkeypatch.setattr(rep_pricelist, 'read_excel', read_excel)
+    assert store.import_pricelist(upload, 'Master Sheet') == version
+    assert store.has_version(version)
+
+
+def test_codes_come_back_upper_cased_with_text_prices_kept_apart(store):
+    version = store.import_pricelist(Upload(pricelist_workbook(200)), 'Master Sheet')
+    pricelist = pricelist_frame(200)
+    codes = pricelist['Item number'].str.upper()
+
+    found = store.lookup(version, codes.tolist() + ['NOT LISTED'], ['Dealer Price', 'Price Text'])
+    assert sorted(found.index) == sorted(codes)
+    text = pricelist['Dealer Excl'].map(lambda value: isinstance(value, str)).to_numpy()
+    assert found.loc[codes[text], 'Price Text'].eq('TBA').all()
+    assert found.loc[codes[text], 'Dealer Price'].isna().all()
+    assert found.loc[codes[~text], 'Dealer Price'].tolist() == pytest.approx(pricelist.loc[~text, 'Dealer Excl'].tolist())
+
+
+def test_attach_adds_prices_by_row_like_a_left_merge(store):
+    version = store.import_pricelist(Upload(pricelist_workbook(20)), 'Master Sheet')
+    df = pd.DataFrame({'365 Code': pd.Categorical(['SN00003', 'NOT LISTED', 'SN00003', None, 'SN00001'])})
+    priced = store.attach(df, '365 Code', version, ['Dealer Price'])
+
+    expected = pricelist_frame(20).assign(code=lambda pl: pl['Item number'].str.upper()).set_index('code')['Dealer Excl']
+    prices = priced['Dealer Price'].tolist()
+    assert prices[0] == prices[2] == pytest.approx(expected['SN00003'])
+    assert prices[4] == pytest.approx(expected['SN00001'])
+    assert pd.isna(prices[1]) and pd.isna(prices[3])
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from rep_quality import check_quality
+
+COLUMNS = ['365 Code', 'Product Description', 'Stock on Hand', 'Sell Out']
+KEYS = ['365 Code', 'Rep', 'Retailer', 'Week No.']
+
+
+def baseline_lists(final_df):
+    """The three tables the weekly page showed before check_quality, with text prices still in Dealer Price"""
+    lists = []
+    for rows in (final_df[final_df['Dealer Price'].isna()],
+                 final_df[final_df['Dealer Price'].apply(lambda x: isinstance(x, str))]):
+        summary = rows[COLUMNS].drop_duplicates().groupby(['365 Code', 'Product Description']).agg(
+            {'Stock on Hand': 'sum', 'Sell Out': 'sum'}).reset_index()
+        lists.append(summary[(summary['Stock on Hand'] > 0) | (summary['Sell Out'] > 0)].reset_index(drop=True))
+    duplicates = final_df.duplicated(subset=KEYS, keep=False)
+    lists.append(final_df[duplicates][KEYS].drop_duplicates().reset_index(drop=True))
+    return lists
+
+
+def merged_frame(rows=600, seed=0):
+    rng = np.random.default_rng(seed)
+    products = rng.integers(0, 40, rows)
+    prices = rng.uniform(50, 500, 40).round(2).astype(object)
+    prices[:4] = np.nan      # not on the pricelist
+    prices[4:7] = 'TBA'      # on it without a price
+    return pd.DataFrame({
+        '365 Code': [f'SN{i:03d}' for i in products],
+        'Product Description': [f'Product {i}' for i in products],
+        'Rep': rng.choice(['Rep 0', 'Rep 1'], rows),
+        'Retailer': rng.choice(['Makro', 'Game', 'Takealot'], rows),
+        'Week No.': 'Week 1',
+        # Some products sell nothing, so drop out of the price lists
+        'Stock on Hand': np.where(products % 4 == 0, 0, rng.integers(0, 30, rows)),
+        'Sell Out': np.where(products % 4 == 0, 0, rng.integers(0, 10, rows)),
+        'Dealer Price': prices[products],
+    })
+
+
+def assert_matches_baseline(report, df):
+    not_on_pricelist, without_price, duplicates = baseline_lists(df)
+    assert not duplicates.empty and not not_on_pricelist.empty and not without_price.empty
+    pd.testing.assert_frame_equal(report.not_on_pricelist, not_on_pricelist, check_dtype=False)
+    pd.testing.assert_frame_equal(report.without_price, without_price, check_dtype=False)
+    pd.testing.assert_frame_equal(report.duplicates, duplicates, check_dtype=False)
+
+
+def test_read_back_frame_matches_the_baseline_lists():
+    df = merged_frame()
+    assert_matches_baseline(check_quality(df, '365 Code'), df)
+
+
+def test_pricelist_store_frame_matches_the_baseline_lists():
+    df = merged_frame(seed=1)
+    # What PricelistStore.attach gives: numeric prices, with the text kept apart
+    store = df.assign(**{
+        'Price Text': df['Dealer Price'].where(df['Dealer Price'].map(lambda value: isinstance(value, str))),
+        'Dealer Price': pd.to_numeric(df['Dealer Price'], errors='coerce'),
+    })
+    report = check_quality(store, '365 Code')
+    assert_matches_baseline(report, df)
+    assert report.counts() == {'Not on pricelist': len(report.not_on_pricelist),
+                               'Without a price': len(report.without_price),
+                               'Duplicated': len(report.duplicates)}
+    assert not report.clean
@@ -0,0 +1,51 @@
+import datetime as dt
+from io import BytesIO
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from benchmarks.workbooks import weekly_frame
+from rep_dtypes import apply_dtype_policy
+from rep_export import write_xlsx
+from rep_reports import REPORT_SPECS, upload_frame
+from rep_sidecar import read_weekly_output, sidecar_available, to_sidecar
+from rep_sqlload import natural_key, upsert
+
+pytestmark = pytest.mark.skipif(not sidecar_available(), reason='pyarrow is not installed')
+
+
+class Upload(BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def weekly_sheets():
+    """Sheets as the weekly report hands them to the exports: categoricals and a datetime.date week ending"""
+    df = apply_dtype_policy(weekly_frame(rows=400, seed=1))
+    df = df.drop_duplicates(natural_key('365 Code'), ignore_index=True)
+    df['Week Ending'] = dt.date(2024, 5, 12)
+    return {'Bino': df[df['Category'] == 'Bino'], 'Everything Else': df[df['Category'] != 'Bino']}
+
+
+def test_sidecar_dates_match_xlsx():
+    sheets = weekly_sheets()
+    from_xlsx = read_weekly_output(Upload(write_xlsx(sheets), 'week.xlsx'))
+    from_sidecar = read_weekly_output(Upload(to_sidecar(sheets), 'week.parquet'))
+    for name in sheets:
+        assert pd.api.types.is_datetime64_dtype(from_sidecar[name]['Week Ending'])
+        assert (from_sidecar[name]['Week Ending'] == from_xlsx[name]['Week Ending']).all()
+
+
+def test_same_week_from_xlsx_and_sidecar_is_stored_once(tmp_path):
+    sheets = weekly_sheets()
+    engine = create_engine(f"sqlite:///{tmp_path / 'fact.sqlite'}")
+    spec = REPORT_SPECS['365 Code']
+    for upload in (Upload(write_xlsx(sheets), 'week.xlsx'), Upload(to_sidecar(sheets), 'week.parquet')):
+        df, _ = upload_frame(spec, [upload])
+        upsert(df, 'fact_repsellout', engine, natural_key(spec.code))
+
+    with engine.connect() as conn:
+        stored = conn.execute(text('SELECT COUNT(*) FROM fact_repsellout')).scalar()
+    assert stored == sum(len(df) for df in sheets.values())
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.workbooks import weekly_frame
+from rep_sqlload import LOAD_METHODS, bulk_load, natural_key, upsert
+
+TABLE = 'fact_repsellout'
+KEYS = natural_key('365 Code')
+
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite, one connection shared by every checkout so the table outlives each transaction"""
+    engine = create_engine('sqlite://', poolclass=StaticPool, connect_args={'check_same_thread': False})
+    yield engine
+    engine.dispose()
+
+
+def stored(engine):
+    return pd.read_sql(f'SELECT * FROM {TABLE}', engine)
+
+
+def unique_rows(rows, seed=0):
+    return weekly_frame(rows, seed=seed).drop_duplicates(KEYS, ignore_index=True)
+
+
+@pytest.mark.parametrize('method', [method for method in LOAD_METHODS if method != 'infile'])
+def test_upsert_twice_updates_instead_of_adding(engine, method):
+    df = unique_rows(500)
+    first = upsert(df, TABLE, engine, KEYS, method=method, batch_rows=64)
+    assert (first.rows, first.updated, first.dropped) == (len(df), 0, 0)
+
+    changed = df.assign(**{'Sell Out': df['Sell Out'] + 1})
+    second = upsert(changed, TABLE, engine, KEYS, method=method, batch_rows=64)
+    assert (second.rows, second.updated) == (len(df), len(df))
+
+    result = stored(engine)
+    assert len(result) == len(df)
+    assert result['Sell Out'].sum() == changed['Sell Out'].sum()
+
+
+def test_upsert_keeps_the_last_row_of_a_repeated_key(engine):
+    df = unique_rows(200)
+    repeated = df.head(10).assign(**{'Sell Out': 999})
+    result = upsert(pd.concat([df, repeated], ignore_index=True), TABLE, engine, KEYS)
+
+    assert (result.rows, result.dropped) == (len(df), len(repeated))
+    assert (stored(engine)['Sell Out'] == 999).sum() == len(repeated)
+
+
+def test_upsert_refuses_a_table_that_already_has_duplicate_keys(engine):
+    df = unique_rows(50)
+    bulk_load(pd.concat([df, df.head(3)], ignore_index=True), TABLE, engine)
+    with pytest.raises(ValueError, match='HAVING COUNT'):
+        upsert(df, TABLE, engine, KEYS)
+
+    with engine.connect() as conn:
+        assert conn.execute(text(f'SELECT COUNT(*) FROM {TABLE}')).scalar() == len(df) + 3
@@ -0,0 +1,68 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+import rep_transform
+from benchmarks.workbooks import rep_sheet
+from rep_transform import PairingError, excel_header_names, normalise_labels, stack_header, transform_data
+
+
+def read_back(rows, header):
+    """rows written to an xlsx and read again, as the rep workbooks are"""
+    output = BytesIO()
+    pd.DataFrame(rows).to_excel(output, header=False, index=False)
+    return pd.read_excel(BytesIO(output.getvalue()), header=header)
+
+
+@pytest.mark.parametrize('row', [
+    ['Code', None, 'Makro', 'Makro', None, 'Game'],
+    ['A', 'A', 'A.1', 'A', None],
+    ['Makro', 'Makro.1', 'Makro', 'Makro', 'Makro.2'],
+])
+def test_excel_header_names_match_read_excel(row):
+    names = excel_header_names(read_back([row, [0] * len(row)], None).iloc[0])
+    assert names.tolist() == read_back([row, [0] * len(row)], 0).columns.tolist()
+
+
+def test_transform_data_one_row_per_product_retailer_and_week():
+    raw = rep_sheet(products=50, retailers=['Makro', 'Game'], weeks=3)
+    df = transform_data(raw, '365 Code')
+    assert len(df) == 50 * 2 * 3
+    assert sorted(df['Retailer'].unique()) == ['Game', 'Makro']
+
+    week = transform_data(raw, '365 Code', weeks=['Week 1'])
+    assert len(week) == 50 * 2
+    assert (week['Week No.'] == 'Week 1').all()
+
+
+def drop_column(raw, heading):
+    position = list(stack_header(raw)).index(heading)
+    raw = raw.drop(columns=raw.columns[position])
+    raw.columns = range(raw.shape[1])
+    return raw
+
+
+def test_soh_column_without_its_sell_out_is_refused():
+    raw = rep_sheet(products=5, retailers=['Makro'], weeks=2)
+    header = stack_header(raw)
+    sell_out = [label for label in header if 'Sell Out' in label][1]
+    with pytest.raises(PairingError, match='No matching Sell Out column'):
+        transform_data(drop_column(raw, sell_out), '365 Code')
+
+
+def test_sell_out_column_without_its_soh_is_refused():
+    raw = rep_sheet(products=5, retailers=['Makro'], weeks=2)
+    soh = [label for label in stack_header(raw) if 'Week 1' in label][0]
+    with pytest.raises(PairingError, match='No matching SOH column'):
+        transform_data(drop_column(raw, soh), '365 Code')
+
+
+def test_label_memo_and_plans_stay_bounded(monkeypatch):
+    monkeypatch.setattr(rep_transform, 'LABEL_MEMO_ENTRIES', 5)
+    monkeypatch.setattr(rep_transform, 'PLAN_ENTRIES', 2)
+    for weeks in (1, 2, 3):
+        transform_data(rep_sheet(products=5, retailers=['Makro', 'Game'], weeks=weeks), '365 Code')
+    assert len(rep_transform._plans) <= 2
+    assert len(normalise_labels(pd.Series([f' Shop {i} ' for i in range(8)]), 'Retailer')) == 8
+    assert all(len(memo) <= 5 for memo in rep_transform._label_memo.values())
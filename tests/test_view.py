@@ -0,0 +1,48 @@
+import pandas as pd
+
+from rep_view import cap_rows, labels, page_of
+
+
+def frame():
+    return pd.DataFrame({
+        '365 Code': pd.Categorical(['SN3', 'AB1', 'SN1', 'SN2', 'AB2', None]),
+        'Retailer': ['Makro', 'Game', 'Makro', 'Takealot', 'Makro', 'Game'],
+        'Sell Out': [5, 1, 3, 4, 2, 6],
+    }, index=[10, 11, 12, 13, 14, 15])
+
+
+def test_filters_by_values_and_by_code_prefix():
+    page, rows, pages = page_of(frame(), {'Retailer': ['Makro'], '365 Code': ' sn', 'Sub-Cat': []})
+    assert page['365 Code'].tolist() == ['SN3', 'SN1']
+    assert (rows, pages) == (2, 1)
+
+
+def test_sorts_categoricals_by_label_with_blanks_last():
+    page, _, _ = page_of(frame(), sort_by='365 Code')
+    assert page['365 Code'].tolist()[:5] == ['AB1', 'AB2', 'SN1', 'SN2', 'SN3']
+    assert pd.isna(page['365 Code'].iloc[5])
+
+    page, _, _ = page_of(frame(), sort_by='Sell Out', descending=True)
+    assert page['Sell Out'].tolist() == [6, 5, 4, 3, 2, 1]
+    # Rows keep their own index, so nothing is copied or renumbered
+    assert page.index.tolist() == [15, 10, 13, 12, 14, 11]
+
+
+def test_page_number_is_clamped_to_the_pages_there_are():
+    df = frame()
+    last, rows, pages = page_of(df, sort_by='Sell Out', page=99, rows=4)
+    assert (rows, pages) == (6, 2)
+    assert last['Sell Out'].tolist() == [5, 6]
+    first, _, _ = page_of(df, sort_by='Sell Out', page=0, rows=4)
+    assert first['Sell Out'].tolist() == [1, 2, 3, 4]
+
+    empty, rows, pages = page_of(df, {'Retailer': ['Nowhere']}, page=3)
+    assert empty.empty and (rows, pages) == (0, 1)
+
+
+def test_labels_and_cap_rows():
+    df = frame()
+    assert labels(df['365 Code'].iloc[:2]) == ['AB1', 'SN3']
+    head, cut = cap_rows(df, rows=4)
+    assert len(head) == 4 and cut
+    assert cap_rows(df, rows=6)[1] is False